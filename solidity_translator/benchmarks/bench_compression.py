@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import time
+
+from src.utils.compressed_io import open_file
+from src.utils.sample_loader_saver import read_items_from_file
+
+# (label, file suffix, compression level)
+CODECS = [
+    ('plain', '', None),
+    ('gzip-1', '.gz', 1),
+    ('gzip-6', '.gz', 6),
+    ('gzip-9', '.gz', 9),
+    ('xz-0', '.xz', 0),
+    ('xz-6', '.xz', 6),
+]
+
+
+def bench_codec(source_file_name: str, source_path_name: str, suffix: str, level, work_dir: str):
+    with open(source_path_name + source_file_name, 'r') as file:
+        content = file.read()
+
+    target_file_name = 'bench' + os.path.splitext(source_file_name)[1] + suffix
+
+    start = time.perf_counter()
+    with open_file(work_dir + target_file_name, 'w', compresslevel=level) as file:
+        file.write(content)
+    write_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    n_items = len(read_items_from_file(target_file_name, work_dir))
+    read_seconds = time.perf_counter() - start
+
+    size = os.path.getsize(work_dir + target_file_name)
+    os.remove(work_dir + target_file_name)
+    return size, write_seconds, read_seconds, n_items
+
+
+def main():
+    if len(sys.argv) != 2:
+        print('Please give the name of a separator-delimited file inside the data directory.')
+        print('python -m benchmarks.bench_compression contracts_descriptions.txt')
+        exit(1)
+
+    source_file_name = sys.argv[1]
+    source_size = os.path.getsize('./data/' + source_file_name)
+    megabytes = source_size / 1e6
+
+    print('%-8s %12s %8s %14s %14s' % ('codec', 'bytes', 'ratio', 'write MB/s', 'read MB/s'))
+    with tempfile.TemporaryDirectory() as work_dir:
+        for label, suffix, level in CODECS:
+            size, write_seconds, read_seconds, n_items = bench_codec(
+                source_file_name, './data/', suffix, level, work_dir + '/')
+            print('%-8s %12d %8.2f %14.1f %14.1f' % (label, size, source_size / size,
+                                                    megabytes / write_seconds, megabytes / read_seconds))
+    print('%d items, %.1f MB uncompressed' % (n_items, megabytes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+
+from cli import COMMANDS
+
+HEAVY_MODULES = ['torch', 'numpy', 'tqdm']
+
+
+def measure_import(command: str) -> (int, [str], [(int, str)], str):
+    # -X importtime writes one line per imported module to stderr:
+    # 'import time: self [us] | cumulative | imported package'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import cli; cli.load_command(%r)' % command],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    total = 0
+    modules = []
+    top_levels = []
+    other_lines = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            other_lines.append(line)
+            continue
+        if 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative), name.strip()))
+        if not name.startswith('  '):
+            top_levels.append(name.strip())
+            total += int(cumulative)
+    heavy = [module for module in HEAVY_MODULES if module in top_levels or any(name.strip() == module for _, name in modules)]
+    # A command that fails to import, like train without torch, is reported with the last line of its error
+    error = None
+    if result.returncode != 0:
+        error = other_lines[-1] if other_lines else 'exit status %d' % result.returncode
+    return total, heavy, sorted(modules, reverse=True), error
+
+
+def main():
+    # Usage: python -m benchmarks.bench_import_time [command ...]
+    commands = sys.argv[1:] or list(COMMANDS)
+    print('%-10s %12s  %s' % ('command', 'imports', 'heavy modules'))
+    for command in commands:
+        total, heavy, modules, error = measure_import(command)
+        if error is not None:
+            print('%-10s %12s  failed: %s' % (command, '-', error))
+            continue
+        print('%-10s %10.1fms  %s' % (command, total / 1000, ', '.join(heavy) if heavy else '-'))
+        for cumulative, name in modules[:3]:
+            print('%-10s %10.1fms    %s' % ('', cumulative / 1000, name))
+
+
+if __name__ == '__main__':
+    main()
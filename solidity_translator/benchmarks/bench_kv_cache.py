@@ -0,0 +1,52 @@
+import sys
+import time
+
+from src.transformer_pipeline import DEFAULT_MODEL_PATH, DEFAULT_VOCAB_PATH, TransformerPipeline
+
+BUCKET_SIZE = 10
+
+
+def decode_timed(pipeline: TransformerPipeline, insts: [[int]], use_kv_cache: bool) -> ([str], float):
+    pipeline.translator.use_kv_cache = use_kv_cache
+    start = time.perf_counter()
+    pred_lines = pipeline.decode_uncached(insts)
+    return pred_lines, time.perf_counter() - start
+
+
+def main():
+    # Usage: python -m benchmarks.bench_kv_cache tokenized_descriptions.txt [model.chkpt vocab.pt [n_sentences]]
+    # The descriptions are one per line, tokenized and with placeholders extracted, like the transformer's input
+    with open(sys.argv[1]) as file:
+        tokenized_lines = file.read().splitlines()
+    model_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL_PATH
+    vocab_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_VOCAB_PATH
+    if len(sys.argv) > 4:
+        tokenized_lines = tokenized_lines[:int(sys.argv[4])]
+    pipeline = TransformerPipeline(model_path, vocab_path)
+    insts = pipeline.encode(tokenized_lines)
+
+    full, full_seconds = decode_timed(pipeline, insts, False)
+    cached, cached_seconds = decode_timed(pipeline, insts, True)
+    n_mismatches = sum(a != b for a, b in zip(full, cached))
+    print('%d sentences in batches of %d: full prefix %.2fs, kv cache %.2fs (%.2fx), %d different outputs' % (
+        len(insts), pipeline.batch_size, full_seconds, cached_seconds, full_seconds / cached_seconds, n_mismatches))
+
+    # One sentence at a time, so the time of each can be attributed to its output length
+    buckets = {}
+    for inst, pred_line in zip(insts, cached):
+        _, full_seconds = decode_timed(pipeline, [inst], False)
+        _, cached_seconds = decode_timed(pipeline, [inst], True)
+        bucket = buckets.setdefault(len(pred_line.split()) // BUCKET_SIZE, [0, 0.0, 0.0])
+        bucket[0] += 1
+        bucket[1] += full_seconds
+        bucket[2] += cached_seconds
+
+    print('%-14s %6s %14s %14s %8s' % ('output words', 'count', 'full ms', 'kv cache ms', 'speedup'))
+    for k, (count, full_seconds, cached_seconds) in sorted(buckets.items()):
+        print('%-14s %6d %14.1f %14.1f %7.2fx' % (
+            '%d-%d' % (k * BUCKET_SIZE, (k + 1) * BUCKET_SIZE - 1), count, full_seconds / count * 1000,
+            cached_seconds / count * 1000, full_seconds / cached_seconds))
+
+
+if __name__ == '__main__':
+    main()
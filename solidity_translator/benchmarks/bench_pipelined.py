@@ -0,0 +1,29 @@
+import sys
+import time
+
+from src.transformer_pipeline import DEFAULT_MODEL_PATH, DEFAULT_VOCAB_PATH, TransformerPipeline
+from src.utils.sample_loader_saver import load_sample_texts
+
+
+def main():
+    # Usage: python -m benchmarks.bench_pipelined descriptions.txt [model.chkpt vocab.pt]
+    contract_texts = load_sample_texts(sys.argv[1], './data/')
+    model_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL_PATH
+    vocab_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_VOCAB_PATH
+    pipeline = TransformerPipeline(model_path, vocab_path)
+
+    start = time.perf_counter()
+    sequential = pipeline.translate(contract_texts)
+    sequential_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pipelined = list(pipeline.translate_pipelined(iter(contract_texts)))
+    pipelined_seconds = time.perf_counter() - start
+
+    assert pipelined == sequential
+    print('%d contracts: one stage after another %.2fs, pipelined %.2fs (%.2fx)' % (
+        len(contract_texts), sequential_seconds, pipelined_seconds, sequential_seconds / pipelined_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import random
+import sys
+import time
+
+from src.placeholders import detokenize_prediction, substitute_placeholders, substitute_placeholders_sequentially
+
+LINE_TEMPLATE = 'contract VAR%d { uint VAR%d = num%d ; function VAR%d ( ) public { VAR%d = VAR%d + num%d ; } } \\ n '
+
+
+def make_prediction(n_placeholders: int) -> (str, dict, dict):
+    n_numbers = max(1, n_placeholders // 4)
+    n_variables = max(1, n_placeholders - n_numbers)
+    number_table = {'NUM%d' % (i + 1): random.randint(0, 10000) for i in range(n_numbers)}
+    variable_table = {'VAR%d' % (i + 1): 'name_%d' % i for i in range(n_variables)}
+
+    parts = []
+    for _ in range(max(1, n_placeholders // 2)):
+        v = [random.randint(1, n_variables) for _ in range(5)]
+        n = [random.randint(1, n_numbers) for _ in range(2)]
+        parts.append(LINE_TEMPLATE % (v[0], v[1], n[0], v[2], v[3], v[4], n[1]))
+    return ' '.join(parts) + '</s>', number_table, variable_table
+
+
+def time_restore(substitute, predictions, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line, number_table, variable_table in predictions:
+            substitute(detokenize_prediction(line), number_table, variable_table)
+    return (time.perf_counter() - start) / (repeat * len(predictions))
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    random.seed(0)
+
+    print('%14s %16s %16s %9s' % ('placeholders', 'per-key re.sub', 'single scan', 'speedup'))
+    for n_placeholders in [10, 100, 300, 1000]:
+        predictions = [make_prediction(n_placeholders) for _ in range(20)]
+        for line, number_table, variable_table in predictions:
+            detokenized = detokenize_prediction(line)
+            assert substitute_placeholders(detokenized, number_table, variable_table) == \
+                substitute_placeholders_sequentially(detokenized, number_table, variable_table)
+
+        sequential = time_restore(substitute_placeholders_sequentially, predictions, repeat)
+        single_scan = time_restore(substitute_placeholders, predictions, repeat)
+        print('%14d %14.3fms %14.3fms %8.1fx' % (n_placeholders, sequential * 1e3, single_scan * 1e3,
+                                                 sequential / single_scan))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import time
+
+from src.utils.paths import HELPER_PATH
+from src.utils.tokenizer import Tokenizer
+
+
+def tokenize_with_perl(file_path: str, language: str) -> [str]:
+    with open(file_path, 'rb') as file:
+        result = subprocess.run(
+            ['perl', os.path.join(HELPER_PATH, 'tokenizer.perl'), '-a', '-no-escape', '-l', language, '-q'],
+            stdin=file, stdout=subprocess.PIPE, check=True)
+    return result.stdout.decode('utf-8').split('\n')[:-1]
+
+
+def main():
+    # Usage: python -m benchmarks.check_tokenizer_parity <file> [<file> ...] [-l language]
+    args = sys.argv[1:]
+    language = 'en'
+    if '-l' in args:
+        language = args[args.index('-l') + 1]
+        del args[args.index('-l'): args.index('-l') + 2]
+
+    tokenizer = Tokenizer(language)
+    n_mismatches = 0
+    for file_path in args:
+        start = time.perf_counter()
+        expected = tokenize_with_perl(file_path, language)
+        perl_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(file_path, 'r', encoding='utf-8', newline='\n') as file:
+            actual = tokenizer.tokenize_lines(file)
+        python_seconds = time.perf_counter() - start
+
+        mismatches = [i for i, (a, b) in enumerate(zip(expected, actual)) if a != b]
+        if len(expected) != len(actual):
+            mismatches.append(min(len(expected), len(actual)))
+        n_mismatches += len(mismatches)
+
+        print('%s: %d lines, %d mismatches, perl %.3fs, python %.3fs' %
+              (file_path, len(expected), len(mismatches), perl_seconds, python_seconds))
+        for i in mismatches[:5]:
+            print('  line %d' % (i + 1))
+            print('    perl:   %r' % (expected[i] if i < len(expected) else None))
+            print('    python: %r' % (actual[i] if i < len(actual) else None))
+
+    sys.exit(1 if n_mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import sys
+import time
+
+from src.transformer_pipeline import DEFAULT_MODEL_PATH, DEFAULT_VOCAB_PATH, TransformerPipeline
+
+# The first mode is the reference the others are compared with
+MODES = [('beam', 5), ('beam', 3), ('beam', 2), ('greedy', 1)]
+
+
+def set_mode(pipeline: TransformerPipeline, decode_mode: str, beam_size: int):
+    pipeline.translator.decode_mode = decode_mode
+    pipeline.translator.opt.beam_size = beam_size
+
+
+def percentile(values: [float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    # Usage: python -m benchmarks.report_decode_modes tokenized_descriptions.txt [model.chkpt vocab.pt [n_sentences]]
+    # The descriptions are one per line, tokenized and with placeholders extracted, like the transformer's input
+    with open(sys.argv[1]) as file:
+        tokenized_lines = file.read().splitlines()
+    model_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL_PATH
+    vocab_path = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_VOCAB_PATH
+    if len(sys.argv) > 4:
+        tokenized_lines = tokenized_lines[:int(sys.argv[4])]
+    pipeline = TransformerPipeline(model_path, vocab_path)
+    insts = pipeline.encode(tokenized_lines)
+
+    reference = None
+    print('%-8s %5s %12s %14s %14s %14s' % ('mode', 'beam', 'same output', 'batched s', 'single ms', 'single p95 ms'))
+    for decode_mode, beam_size in MODES:
+        set_mode(pipeline, decode_mode, beam_size)
+
+        # Batched, as translate.py decodes files, and one description at a time, as interactive requests arrive
+        start = time.perf_counter()
+        pred_lines = pipeline.decode_uncached(insts)
+        batched_seconds = time.perf_counter() - start
+        single_seconds = []
+        for inst in insts:
+            start = time.perf_counter()
+            pipeline.decode_uncached([inst])
+            single_seconds.append(time.perf_counter() - start)
+
+        if reference is None:
+            reference = pred_lines
+        n_same = sum(a == b for a, b in zip(pred_lines, reference))
+        print('%-8s %5d %11.1f%% %14.2f %14.1f %14.1f' % (
+            decode_mode, beam_size, n_same / len(insts) * 100, batched_seconds,
+            sum(single_seconds) / len(insts) * 1000, percentile(single_seconds, 0.95) * 1000))
+
+
+if __name__ == '__main__':
+    main()
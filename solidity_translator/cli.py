@@ -0,0 +1,46 @@
+import importlib
+import sys
+
+# Every command keeps the arguments of the script it runs. The script is only
+# imported once its command is picked, so a rule translation never loads torch
+# and data preparation never loads the language rules it does not use
+COMMANDS = {
+    'generate': ('generate', 'Generate descriptions and codes of random contracts'),
+    'prepare': ('prepare_descriptions_for_transformer', 'Replace numbers and names in descriptions by placeholders'),
+    'tokenize': ('tokenization', 'Tokenize the transformer training files'),
+    'train': ('train', 'Train the transformer (the helper\'s train.py)'),
+    'translate': ('translate', 'Translate descriptions by rule, transformer or both'),
+    'reformat': ('reformat_transformer_output', 'Restore placeholders in the transformer\'s predictions'),
+    'serve': ('serve', 'Serve translations with the model kept loaded'),
+}
+
+
+def load_command(command: str):
+    module_name = COMMANDS[command][0]
+    if command == 'train':
+        from src.transformer_pipeline import import_helper_modules
+
+        import_helper_modules()
+    return importlib.import_module(module_name).main
+
+
+def print_usage():
+    print('python cli.py command [arguments]')
+    print('Run a command without arguments to see its own usage. The commands are:')
+    for command, (_, description) in COMMANDS.items():
+        print('  %-10s %s' % (command, description))
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print_usage()
+        exit(1)
+
+    command = sys.argv[1]
+    command_main = load_command(command)
+    sys.argv = [COMMANDS[command][0] + '.py'] + sys.argv[2:]
+    command_main()
+
+
+if __name__ == '__main__':
+    main()
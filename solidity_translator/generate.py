@@ -1,8 +1,11 @@
 import sys
 
 from src.sample_generator import *
-from src.utils.sample_loader_saver import write_items_to_file
+from src.utils.sample_loader_saver import format_item
+from src.utils.shards import write_sharded_items
+from src.utils.background_writer import BackgroundWriter
 from src.utils.general_utils import beautify_contract_codes
+from src.utils.options import pop_option
 
 POTENTIAL_NAMES = list('a b c d e f g h i j k l m n o p'.split())
 POTENTIAL_NAMES_PLACEHOLDERS = ['VAR' + str(i) for i in range(1,7)]
@@ -88,10 +91,13 @@ def main():
                      'contract_with_func_and_var_exp', 'demo_func1_with_placeholder', 'demo_func2_with_placeholder',
                      'all']
 
+    n_shards = pop_option(sys.argv, '--shards', 1, int, 'the number of shards')
+
     if len(sys.argv) < 6:
         print('Please give arguments as follows:')
         print('python generate.py text_file_name.txt code_file_name.txt 10 emit no')
         print('The example above will generate 10 samples of emit template with no format and save it in the corresponding files in data directory')
+        print('Add --shards K to split each file into K shards with a manifest next to them')
         print('Allowed names are', allowed_names)
         exit(1)
     text_file_name = sys.argv[1]
@@ -117,14 +123,27 @@ def main():
     formatize = True if sys.argv[len(sys.argv) - 1] == 'yes' else False
 
     samples = generate_samples(n, given_names)
-    write_items_to_file(list(map(lambda sample: sample.convert_to_text(), samples)),
-                        text_file_name,
-                        './data/',
-                        formatize=formatize)
-    write_items_to_file(list(map(lambda sample: beautify_contract_codes(sample.convert_to_solidity()), samples)),
-                        code_file_name,
-                        './data/',
-                        formatize=formatize)
+    if n_shards > 1:
+        write_sharded_items(list(map(lambda sample: sample.convert_to_text(), samples)),
+                            text_file_name,
+                            n_shards,
+                            './data/',
+                            formatize=formatize)
+        write_sharded_items(list(map(lambda sample: beautify_contract_codes(sample.convert_to_solidity()), samples)),
+                            code_file_name,
+                            n_shards,
+                            './data/',
+                            formatize=formatize)
+        return
+
+    # Samples are rendered here while the writer threads flush the previous ones to disk
+    with BackgroundWriter('./data/' + text_file_name) as text_writer, \
+            BackgroundWriter('./data/' + code_file_name) as code_writer:
+        for sample in samples:
+            text_writer.write(format_item(sample.convert_to_text(), formatize))
+            code_writer.write(format_item(beautify_contract_codes(sample.convert_to_solidity()), formatize))
+
+    print('Waited %.3fs on full write queues' % (text_writer.producer_wait_seconds + code_writer.producer_wait_seconds))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,70 +1,75 @@
 import sys
-from functools import reduce
+from itertools import repeat, tee, zip_longest
 
 import src.utils.sample_loader_saver as sls
-from src.language_rules.expressions import Expression
-from src.language_rules.templates import Template
-
-
-def extract_numbers_and_vars_from_contract_description(contract_description: [str]) -> (str, dict, dict):
-    reserved_vocab = Expression.get_description_vocab() + Template.get_description_vocab()
-    reserved_vocab += '( ) [ ] { } , . \\n :'.split(' ')
-    reserved_vocab += [
-        'uint',
-        'int',
-        'double',
-        'float',
-        'address',
-        'bytes32',
-        'boolean',
-    ]
-    reserved_vocab += [
-        'public',
-        'private',
-        'view',
-        'returns',
-        '(uint)'
-    ]
-
-    # Combine all strings into one
-    contract_description = reduce(lambda s1, s2: s1 + ' \\n ' + s2, contract_description) + ' \\n'
-    number_table = {}
-    n2k = {}
-    variable_table = {}
-    v2k = {}
-    ncnt = 1
-    vcnt = 1
-    
-    contract_description = contract_description.replace('\n', '\\n').replace('[', '[ ').replace(']', ' ]')
-    contract_description = contract_description.replace(':', ' :').replace(',', ' ,')
-    extracted_contract_description = contract_description.split(' ')
-    for i in range(len(extracted_contract_description)):
-        try:
-            num = int(extracted_contract_description[i])
-            if num not in n2k:
-                n2k[num] = 'NUM%d' % ncnt
-                number_table['NUM%d' % ncnt] = num
-                ncnt += 1
-
-            extracted_contract_description[i] = n2k[num]
-
-        except ValueError:
-            if extracted_contract_description[i].lower() not in reserved_vocab:
-                if extracted_contract_description[i] not in v2k:
-                    v2k[extracted_contract_description[i]] = 'VAR%d' % vcnt
-                    variable_table['VAR%d' % vcnt] = extracted_contract_description[i]
-                    vcnt += 1
-                extracted_contract_description[i] = v2k[extracted_contract_description[i]]
-
-    extracted_contract_description = ' '.join(extracted_contract_description).replace('[ ', '[').replace(' ]', ']')
-    
-    return extracted_contract_description, number_table, variable_table
+import src.utils.contract_records as ctr
+from src.utils.compressed_io import open_file
+from src.utils.instrumentation import finish_report, pop_report_option
+from src.utils.options import pop_option
+from src.placeholders import extract, extract_numbers_and_vars_from_contract_description, iter_extracted, save_tables
+
+
+def iter_descriptions_with_codes(input_file_name: str, code_file_name: str, path_name: str):
+    descriptions = sls.iter_sample_texts(input_file_name, path_name)
+    if code_file_name is None:
+        yield from zip(descriptions, repeat(None))
+        return
+
+    missing = object()
+    for description, code in zip_longest(descriptions, sls.iter_sample_codes(code_file_name, path_name),
+                                         fillvalue=missing):
+        if description is missing or code is missing:
+            raise ValueError('%s and %s do not hold the same number of contracts' % (input_file_name, code_file_name))
+        yield description, code
+
+
+def prepare_contract_records(input_file_name: str, output_file_name: str, records_file_name: str, path_name: str = './data/',
+                             n_workers: int = 1, code_file_name: str = None) -> int:
+    if ctr.is_contract_record_file(input_file_name):
+        records = ctr.iter_contract_records(input_file_name, path_name)
+    else:
+        # The codes, when given, are kept with their descriptions in the records
+        records = (ctr.make_contract_record(description, code) for description, code in
+                   iter_descriptions_with_codes(input_file_name, code_file_name, path_name))
+
+    # The encoded descriptions and the records are written in the same pass so they cannot drift apart
+    with open_file(path_name + output_file_name, 'w') as output_file:
+        def extract_records():
+            records_to_fill, records_to_extract = tee(records)
+            descriptions = (record['description'] for record in records_to_extract)
+            for record, (extracted_contract_description, number_table, variable_table) in \
+                    zip(records_to_fill, iter_extracted(descriptions, n_workers)):
+                record['extracted_description'] = extracted_contract_description
+                record['number_table'] = number_table
+                record['variable_table'] = variable_table
+                output_file.write(extracted_contract_description)
+                output_file.write('\n')
+                yield record
+
+        return ctr.write_contract_records(extract_records(), records_file_name, path_name)
+
 
 def main():
+    n_workers = pop_option(sys.argv, '--workers', 1, int, 'the number of worker processes')
+    code_file_name = pop_option(sys.argv, '--codes', description='the name of the file containing the codes')
+    instrumentation, report_path, print_summary = pop_report_option(sys.argv)
+
+    if len(sys.argv) == 4:
+        with instrumentation.stage('extract') as counts:
+            counts['n_items'] = prepare_contract_records(sys.argv[1], sys.argv[2], sys.argv[3], n_workers=n_workers,
+                                                         code_file_name=code_file_name)
+        finish_report(instrumentation, report_path, print_summary)
+        print('Done preparing the text.')
+        return
+
     if len(sys.argv) != 5:
         print('Please first give the name of the file containing the text to be processed and then'
               'the name of the files where the outputs should be.')
         print('python prepare_descriptions_for_transformer.py input_file_name output_file_name number_tabel_file_name variable_table_file_name')
+        print('python prepare_descriptions_for_transformer.py input_file_name output_file_name records_file_name.jsonl')
+        print('Add --codes code_file_name to keep the code of every contract in its record')
+        print('Add --workers N to spread the contracts over N processes')
+        print('Add --report report.json (or .csv) and/or --summary to time every stage')
         exit(1)
 
     input_file_name = sys.argv[1]
@@ -72,19 +77,15 @@ def main():
     number_tabel_file_name = sys.argv[3]
     variable_table_file_name = sys.argv[4]
 
-    extracted_contracts_descriptions = []
-    number_tables = []
-    variable_tables = []
-    
-    contracts_descriptions = sls.load_sample_texts(input_file_name, './data/')
-    for contract_description in contracts_descriptions:
-        extracted_contract_description, number_table, variable_table = extract_numbers_and_vars_from_contract_description(contract_description)
-        extracted_contracts_descriptions.append(extracted_contract_description)
-        number_tables.append(number_table)
-        variable_tables.append(variable_table)
-
-    sls.write_extracted_contracts_descriptions_to_file(extracted_contracts_descriptions, output_file_name)
-    sls.write_tables_to_file(number_tables, number_tabel_file_name, variable_tables, variable_table_file_name)
+    with instrumentation.stage('extract') as counts:
+        extracted_contracts_descriptions, tables = extract(sls.iter_sample_texts(input_file_name, './data/'), n_workers)
+        counts['n_items'] = len(extracted_contracts_descriptions)
+        counts['n_tokens'] = sum(len(description.split()) for description in extracted_contracts_descriptions)
+
+    with instrumentation.stage('write', len(extracted_contracts_descriptions)):
+        sls.write_extracted_contracts_descriptions_to_file(extracted_contracts_descriptions, output_file_name)
+        save_tables(tables, number_tabel_file_name, variable_table_file_name)
+    finish_report(instrumentation, report_path, print_summary)
 
     print('Done preparing the text.')
 
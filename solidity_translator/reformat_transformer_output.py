@@ -1,40 +1,49 @@
 import sys
-import re
 
 import src.utils.sample_loader_saver as sls
-from src.utils.general_utils import beautify_contract_codes
+import src.utils.contract_records as ctr
+from src.utils.compressed_io import open_file
+from src.placeholders import restore_prediction
+from src.utils.instrumentation import finish_report, pop_report_option
+
 
 def main():
+    instrumentation, report_path, print_summary = pop_report_option(sys.argv)
 
-    if len(sys.argv) != 5:
+    if len(sys.argv) not in (4, 5):
         print('Please first give the names of the files containing the text to be processed and then'
               'the name of the file where the output should be.')
         print('python reformat_transformer_output.py pred_file_name number_tabel_file_name variable_tabel_file_name output_file_name')
+        print('python reformat_transformer_output.py pred_file_name records_file_name.jsonl output_file_name')
+        print('Add --report report.json (or .csv) and/or --summary to time every stage')
         exit(1)
 
     pred_file_name = sys.argv[1]
-    number_tabel_file_name = sys.argv[2]
-    variable_tabel_file_name = sys.argv[3]
-    output_file_name = sys.argv[4]
-
-    file = open('./data/' + output_file_name, 'w')
-    number_tables, variable_tables = sls.load_tables_from_file(number_tabel_file_name, variable_tabel_file_name)
-    lines = sls.read_lines_from_file(pred_file_name)
-    for i in range(len(lines)):
-        line = lines[i]
-        line = line.replace('num', 'NUM').replace('var', 'VAR')
-        line = line.replace('</s>', '').replace('( ', '(').replace(' )', ')').replace('{ ', '{').replace('\\ n ','\n').replace('} ', '}').replace(' ; ', ';')
-
-        for k in number_tables[i]:
-            line = re.sub(r'\b%s\b' % k, str(number_tables[i][k]), line)
-
-        for k in variable_tables[i]:
-            line = re.sub(r'\b%s\b' % k, variable_tables[i][k], line)
-        line = beautify_contract_codes(line)
+    output_file_name = sys.argv[len(sys.argv) - 1]
+
+    if len(sys.argv) == 4:
+        records = ctr.iter_contract_records(sys.argv[2])
+        tables = ((record['number_table'], record['variable_table']) for record in records)
+    else:
+        number_tabel_file_name = sys.argv[2]
+        variable_tabel_file_name = sys.argv[3]
+        number_tables, variable_tables = sls.load_tables_from_file(number_tabel_file_name, variable_tabel_file_name)
+        tables = zip(number_tables, variable_tables)
+
+    file = open_file('./data/' + output_file_name, 'w')
+    for i, line in enumerate(sls.iter_lines_from_file(pred_file_name)):
+        number_table, variable_table = next(tables, (None, None))
+        if number_table is None:
+            file.close()
+            raise ValueError('Prediction %d in %s has no matching placeholder tables' % (i + 1, pred_file_name))
+
+        with instrumentation.stage('restore', 1, len(line.split())):
+            line = restore_prediction(line, number_table, variable_table)
         file.write(line + '\n')
         file.write('*******************************************\n')
 
     file.close()
+    finish_report(instrumentation, report_path, print_summary)
 
 
 
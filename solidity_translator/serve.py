@@ -0,0 +1,56 @@
+import argparse
+
+from src.translation_server import TranslationService, make_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve rule and transformer translations with the model kept loaded')
+    parser.add_argument('-host', default='127.0.0.1')
+    parser.add_argument('-port', type=int, default=8000)
+    parser.add_argument('-socket', default=None, help='Listen on this Unix socket instead of host and port')
+    parser.add_argument('-model', default=None, help='Path to the transformer checkpoint')
+    parser.add_argument('-vocab', default=None, help='Path to the preprocessed data holding the vocabulary')
+    parser.add_argument('-beam_size', type=int, default=5)
+    parser.add_argument('-decode_mode', choices=['beam', 'greedy'], default='beam',
+                        help='greedy keeps only the most probable word at every step, for lower latency')
+    parser.add_argument('-batch_size', type=int, default=30, help='Largest batch the scheduler runs at once')
+    parser.add_argument('-time_budget_ms', type=float, default=0,
+                        help="""Finish a request still decoding this long after its first batch started
+                        with the hypotheses it has, 0 for none""")
+    parser.add_argument('-max_wait_ms', type=float, default=10,
+                        help='How long a request may wait for others to share its batch')
+    parser.add_argument('-cuda', action='store_true')
+    parser.add_argument('-cache_size', type=int, default=10000,
+                        help='How many transformer outputs to keep in memory, 0 disables the cache')
+    parser.add_argument('-cache', default=None, help='Path to a sqlite file that persists the cache across restarts')
+    parser.add_argument('-rule_only', action='store_true', help='Do not load the transformer')
+    parser.add_argument('-quiet', action='store_true', help='Do not log every request')
+    opt = parser.parse_args()
+
+    pipeline = None
+    if not opt.rule_only:
+        # torch is only imported when the transformer is actually served
+        from src.transformer_pipeline import DEFAULT_MODEL_PATH, DEFAULT_VOCAB_PATH, TransformerPipeline
+        from src.translation_cache import TranslationCache
+
+        print('Loading the transformer...')
+        cache = TranslationCache(opt.cache_size, opt.cache) if opt.cache_size > 0 else None
+        pipeline = TransformerPipeline(opt.model or DEFAULT_MODEL_PATH, opt.vocab or DEFAULT_VOCAB_PATH, cuda=opt.cuda,
+                                       beam_size=opt.beam_size, batch_size=opt.batch_size, cache=cache,
+                                       decode_mode=opt.decode_mode, time_budget=opt.time_budget_ms / 1000)
+
+    service = TranslationService(pipeline, opt.batch_size, opt.max_wait_ms / 1000)
+    server = make_server(service, opt.host, opt.port, opt.socket, opt.quiet)
+    print('Serving %s on %s' % (', '.join(server.service.methods()),
+                                opt.socket if opt.socket else 'http://%s:%d' % (opt.host, opt.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
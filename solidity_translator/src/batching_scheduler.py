@@ -0,0 +1,209 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from src.placeholders import restore
+from src.translation_cache import cache_key
+
+
+class PendingRequest:
+    def __init__(self, n_contracts: int, tables: ([dict], [dict])):
+        self.pred_lines = [None] * n_contracts
+        self.n_remaining = n_contracts
+        self.tables = tables
+        self.future = Future()
+        self.arrival_time = time.perf_counter()
+        # The time budget of the request starts when its first batch is decoded
+        self.deadline = None
+
+
+class PendingInstance:
+    def __init__(self, inst: [int], request: PendingRequest, index: int):
+        self.inst = inst
+        self.key = cache_key(inst)
+        self.request = request
+        self.index = index
+        self.arrival_time = request.arrival_time
+        # Instances of the same source submitted while this one was pending, completed with its output
+        self.duplicates = []
+
+
+class BatchingScheduler:
+    def __init__(self, pipeline, max_batch_size: int = 30, max_wait_seconds: float = 0.01):
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+        self.pending = []
+        # The instance queued or being decoded for each key, which later identical ones join
+        self.pending_by_key = {}
+        self.condition = threading.Condition()
+        self.closed = False
+
+        self.n_requests = 0
+        self.n_batches = 0
+        self.n_instances = 0
+        self.n_merged = 0
+        self.batch_size_counts = {}
+        self.max_queue_depth = 0
+        self.total_queue_seconds = 0.0
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, contract_texts: [[str]]) -> Future:
+        # Placeholder extraction, tokenization and encoding run on the caller's
+        # thread, only the beam search is shared between requests
+        insts, tables = self.pipeline.prepare(contract_texts)
+        request = PendingRequest(len(insts), tables)
+        instances = [PendingInstance(inst, request, i) for i, inst in enumerate(insts)]
+
+        cache = self.pipeline.cache
+        if cache is not None:
+            uncached = []
+            for instance in instances:
+                pred_line = cache.get(instance.key)
+                if pred_line is None:
+                    uncached.append(instance)
+                else:
+                    self.complete(instance, pred_line)
+            instances = uncached
+        if not instances:
+            if not request.future.done():
+                request.future.set_result(restore(request.pred_lines, request.tables))
+            return request.future
+
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('The scheduler is closed')
+            for instance in instances:
+                queued = self.pending_by_key.get(instance.key)
+                if queued is None:
+                    self.pending.append(instance)
+                    self.pending_by_key[instance.key] = instance
+                else:
+                    queued.duplicates.append(instance)
+                    self.n_merged += 1
+            self.n_requests += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self.pending))
+            self.condition.notify()
+        return request.future
+
+    def translate(self, contract_texts: [[str]]) -> [str]:
+        return self.submit(contract_texts).result()
+
+    def queue_depth(self) -> int:
+        return len(self.pending)
+
+    def next_batch(self) -> [PendingInstance]:
+        with self.condition:
+            while not self.pending and not self.closed:
+                self.condition.wait()
+            if not self.pending:
+                return []
+
+            # Wait for more instances until the batch is full or the oldest
+            # one has waited long enough, which bounds the added latency
+            deadline = self.pending[0].arrival_time + self.max_wait_seconds
+            while len(self.pending) < self.max_batch_size and not self.closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            if len(self.pending) <= self.max_batch_size:
+                batch = self.pending
+                self.pending = []
+                return batch
+
+            # The oldest instance always goes first, the rest of the batch is
+            # filled with the instances closest to it in source length so
+            # little of the batch is padding
+            oldest = self.pending[0]
+            candidates = sorted(range(1, len(self.pending)),
+                                key=lambda i: (abs(len(self.pending[i].inst) - len(oldest.inst)), i))
+            chosen = set(candidates[:self.max_batch_size - 1])
+            batch = [oldest] + [self.pending[i] for i in sorted(chosen)]
+            self.pending = [self.pending[i] for i in range(1, len(self.pending)) if i not in chosen]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            deadline = self.get_deadline(batch, start)
+            try:
+                pred_lines, timed_out = self.pipeline.decode_batch([instance.inst for instance in batch], deadline)
+            except Exception as e:
+                self.release(batch)
+                for instance in batch:
+                    for waiting in [instance] + instance.duplicates:
+                        if not waiting.request.future.done():
+                            waiting.request.future.set_exception(e)
+                continue
+
+            if self.pipeline.cache is not None:
+                # Outputs cut off by the time budget are returned but not cached
+                self.pipeline.cache.put_many([(instance.key, pred_line) for instance, pred_line, cut_off
+                                              in zip(batch, pred_lines, timed_out) if not cut_off],
+                                             time.perf_counter() - start)
+
+            self.n_batches += 1
+            self.n_instances += len(batch)
+            self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+            self.total_queue_seconds += sum(start - instance.arrival_time for instance in batch)
+
+            # Released after the outputs are cached, so a later identical instance finds them there
+            self.release(batch)
+            for instance, pred_line in zip(batch, pred_lines):
+                for waiting in [instance] + instance.duplicates:
+                    self.complete(waiting, pred_line)
+
+    def get_deadline(self, batch: [PendingInstance], start: float) -> float:
+        # A request spread over several batches shares one time budget, the batch
+        # stops at the earliest deadline of the requests it holds
+        time_budget = self.pipeline.translator.time_budget
+        if not time_budget:
+            return None
+        for instance in batch:
+            if instance.request.deadline is None:
+                instance.request.deadline = start + time_budget
+        return min(instance.request.deadline for instance in batch)
+
+    def release(self, batch: [PendingInstance]):
+        # No instance can join the batch's instances anymore once they are released
+        with self.condition:
+            for instance in batch:
+                del self.pending_by_key[instance.key]
+
+    def complete(self, instance: PendingInstance, pred_line: str):
+        request = instance.request
+        request.pred_lines[instance.index] = pred_line
+        request.n_remaining -= 1
+        if request.n_remaining == 0 and not request.future.done():
+            try:
+                request.future.set_result(restore(request.pred_lines, request.tables))
+            except Exception as e:
+                request.future.set_exception(e)
+
+    def metrics(self) -> dict:
+        return {
+            'queue_depth': self.queue_depth(),
+            'max_queue_depth': self.max_queue_depth,
+            'n_requests': self.n_requests,
+            'n_batches': self.n_batches,
+            'n_instances': self.n_instances,
+            'n_merged': self.n_merged,
+            'mean_batch_size': self.n_instances / self.n_batches if self.n_batches else 0.0,
+            'batch_sizes': {str(size): count for size, count in sorted(self.batch_size_counts.items())},
+            'mean_queue_seconds': self.total_queue_seconds / self.n_instances if self.n_instances else 0.0,
+        }
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
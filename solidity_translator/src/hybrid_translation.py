@@ -0,0 +1,58 @@
+import re
+
+from src.language_rules.templates import DefineContract
+from src.utils.general_utils import beautify_contract_codes
+from src.utils.instrumentation import Instrumentation
+
+# Templates start their descriptions with either 'This <context>' or 'It',
+# which are interchangeable and parse to the same template
+CONTEXT_SUBJECT = re.compile(r'^This \S+ ')
+
+
+def normalize_description_line(line: str) -> str:
+    return CONTEXT_SUBJECT.sub('It ', line.strip('\n'))
+
+
+def parse_contract_strictly(contract_text: [str]):
+    # The rule parser accepts text outside of its grammar and silently drops
+    # or invents parts of it, so a parse only counts when the parsed contract
+    # describes itself with exactly the given lines
+    try:
+        contract = DefineContract.parse_template_from_text(contract_text)
+        parsed_lines = contract.convert_to_text().rstrip('\n').split('\n')
+    except Exception:
+        return None
+
+    if len(parsed_lines) != len(contract_text):
+        return None
+    for parsed_line, line in zip(parsed_lines, contract_text):
+        if normalize_description_line(parsed_line) != normalize_description_line(line):
+            return None
+    return contract
+
+
+def translate_hybrid(contract_texts: [[str]], translate_with_transformer,
+                     instrumentation: Instrumentation = None) -> ([str], [int]):
+    if instrumentation is None:
+        instrumentation = Instrumentation(enabled=False)
+    codes = [None] * len(contract_texts)
+    fallback_indices = []
+
+    with instrumentation.stage('rule', len(contract_texts)):
+        for i, contract_text in enumerate(contract_texts):
+            contract = parse_contract_strictly(contract_text)
+            if contract is None:
+                fallback_indices.append(i)
+            else:
+                codes[i] = beautify_contract_codes(contract.convert_to_solidity())
+    instrumentation.count('rule_contracts', len(contract_texts) - len(fallback_indices))
+    instrumentation.count('transformer_contracts', len(fallback_indices))
+
+    # All the contracts the rules could not handle go to the transformer as one batch,
+    # so it is not even loaded when everything parses
+    if fallback_indices:
+        fallback_codes = translate_with_transformer([contract_texts[i] for i in fallback_indices])
+        for i, code in zip(fallback_indices, fallback_codes):
+            codes[i] = code
+
+    return codes, fallback_indices
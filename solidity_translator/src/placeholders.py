@@ -0,0 +1,215 @@
+from collections import deque
+from itertools import islice
+import multiprocessing
+import re
+
+import src.utils.sample_loader_saver as sls
+from src.utils.general_utils import beautify_contract_codes
+
+
+RESERVED_TYPE_VOCAB = [
+    'uint',
+    'int',
+    'double',
+    'float',
+    'address',
+    'bytes32',
+    'boolean',
+]
+
+RESERVED_FUNC_VOCAB = [
+    'public',
+    'private',
+    'view',
+    'returns',
+    '(uint)'
+]
+
+RESERVED_PUNCTUATION = '( ) [ ] { } , . \\n :'.split(' ')
+
+# Pads the brackets and separators with spaces and escapes newlines in one pass
+DESCRIPTION_PADDING = str.maketrans({'\n': '\\n', '[': '[ ', ']': ' ]', ':': ' :', ',': ' ,'})
+BRACKET_PADDING = re.compile(r'\[ | \]')
+INTEGER_TOKEN = re.compile(r'[+-]?\d+(?:_\d+)*')
+
+TOKEN_NUMBER = 0
+TOKEN_RESERVED = 1
+TOKEN_PUNCTUATION = 2
+TOKEN_IDENTIFIER = 3
+
+_reserved_vocab = None
+
+
+def get_reserved_vocab() -> frozenset:
+    global _reserved_vocab
+    if _reserved_vocab is None:
+        # Imported here so restoring predictions does not load the language rules
+        from src.language_rules.expressions import Expression
+        from src.language_rules.templates import Template
+
+        _reserved_vocab = frozenset(Expression.get_description_vocab() + Template.get_description_vocab() +
+                                    RESERVED_PUNCTUATION + RESERVED_TYPE_VOCAB + RESERVED_FUNC_VOCAB)
+    return _reserved_vocab
+
+
+def classify_description_token(token: str, reserved_vocab: frozenset) -> int:
+    # Mirrors int(): surrounding whitespace and digit group underscores are accepted
+    if INTEGER_TOKEN.fullmatch(token.strip()):
+        return TOKEN_NUMBER
+    lowered = token.lower()
+    if lowered in RESERVED_PUNCTUATION:
+        return TOKEN_PUNCTUATION
+    if lowered in reserved_vocab:
+        return TOKEN_RESERVED
+    return TOKEN_IDENTIFIER
+
+
+def extract_numbers_and_vars_from_contract_description(contract_description: [str]) -> (str, dict, dict):
+    reserved_vocab = get_reserved_vocab()
+
+    # Combine all strings into one
+    contract_description = ' \\n '.join(contract_description) + ' \\n'
+    number_table = {}
+    n2k = {}
+    variable_table = {}
+    v2k = {}
+
+    tokens = contract_description.translate(DESCRIPTION_PADDING).split(' ')
+    for i in range(len(tokens)):
+        token = tokens[i]
+        token_class = classify_description_token(token, reserved_vocab)
+
+        if token_class == TOKEN_NUMBER:
+            num = int(token)
+            if num not in n2k:
+                n2k[num] = 'NUM%d' % (len(n2k) + 1)
+                number_table[n2k[num]] = num
+            tokens[i] = n2k[num]
+
+        elif token_class == TOKEN_IDENTIFIER:
+            if token not in v2k:
+                v2k[token] = 'VAR%d' % (len(v2k) + 1)
+                variable_table[v2k[token]] = token
+            tokens[i] = v2k[token]
+
+    extracted_contract_description = BRACKET_PADDING.sub(lambda match: match.group(0).strip(' '), ' '.join(tokens))
+
+    return extracted_contract_description, number_table, variable_table
+
+
+PLACEHOLDER_KEY = re.compile(r'(?:NUM|VAR)\d+')
+PLACEHOLDER_TOKEN = re.compile(r'\b(?:NUM|VAR)\d+\b')
+
+
+def detokenize_prediction(line: str) -> str:
+    line = line.replace('num', 'NUM').replace('var', 'VAR')
+    return line.replace('</s>', '').replace('( ', '(').replace(' )', ')').replace('{ ', '{').replace('\\ n ','\n').replace('} ', '}').replace(' ; ', ';')
+
+
+def substitute_placeholders_sequentially(line: str, number_table: dict, variable_table: dict) -> str:
+    for k in number_table:
+        line = re.sub(r'\b%s\b' % k, str(number_table[k]), line)
+
+    for k in variable_table:
+        line = re.sub(r'\b%s\b' % k, variable_table[k], line)
+    return line
+
+
+def substitute_placeholders(line: str, number_table: dict, variable_table: dict) -> str:
+    keys = list(number_table) + list(variable_table)
+    if len(set(keys)) != len(keys) or not all(PLACEHOLDER_KEY.fullmatch(k) for k in keys):
+        # Tables that were not produced by the extractor keep the regex-per-key semantics
+        return substitute_placeholders_sequentially(line, number_table, variable_table)
+
+    values = [str(number_table[k]) for k in number_table]
+    for k in variable_table:
+        v = variable_table[k]
+        # re.sub expands escapes in the replacement, so do the same once per key
+        values.append(re.sub(r'\b%s\b' % k, v, k) if '\\' in v else v)
+    rank = {k: i for i, k in enumerate(keys)}
+
+    # Every placeholder is a whole word, so one scan over the words can
+    # replace them all. Applying the keys one after another also substitutes
+    # later keys that appear inside an earlier replacement value (a variable
+    # named VAR7 for instance); resolving the values from the last key
+    # backwards reproduces that exactly.
+    def substitute_after(text: str, min_rank: int) -> str:
+        def lookup(match):
+            i = rank.get(match.group(0), -1)
+            return resolved[i] if i > min_rank else match.group(0)
+        return PLACEHOLDER_TOKEN.sub(lookup, text) if 'NUM' in text or 'VAR' in text else text
+
+    resolved = [None] * len(keys)
+    for i in range(len(keys) - 1, -1, -1):
+        resolved[i] = substitute_after(values[i], i)
+
+    return substitute_after(line, -1)
+
+
+def restore_prediction(line: str, number_table: dict, variable_table: dict) -> str:
+    line = detokenize_prediction(line)
+    line = substitute_placeholders(line, number_table, variable_table)
+    return beautify_contract_codes(line)
+
+
+def extract_chunk(contract_descriptions: [[str]]) -> [(str, dict, dict)]:
+    return [extract_numbers_and_vars_from_contract_description(contract_description)
+            for contract_description in contract_descriptions]
+
+
+def iter_extracted(contract_descriptions, n_workers: int = 1, chunk_size: int = 256):
+    if n_workers <= 1:
+        for contract_description in contract_descriptions:
+            yield extract_numbers_and_vars_from_contract_description(contract_description)
+        return
+
+    contract_descriptions = iter(contract_descriptions)
+    chunks = iter(lambda: list(islice(contract_descriptions, chunk_size)), [])
+    # Only a few chunks per worker are read ahead of the results, which are yielded
+    # in input order. pool.imap would read the whole input at once instead
+    max_chunks_in_flight = 2 * n_workers
+    with multiprocessing.Pool(n_workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(extract_chunk, (chunk,)))
+            if len(pending) >= max_chunks_in_flight:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+# Placeholder tables are kept in memory as a pair of lists, one number table
+# and one variable table per contract, in the order of the descriptions
+def extract(contract_descriptions, n_workers: int = 1, chunk_size: int = 256) -> ([str], ([dict], [dict])):
+    extracted_contracts_descriptions = []
+    number_tables = []
+    variable_tables = []
+
+    for extracted_contract_description, number_table, variable_table in \
+            iter_extracted(contract_descriptions, n_workers, chunk_size):
+        extracted_contracts_descriptions.append(extracted_contract_description)
+        number_tables.append(number_table)
+        variable_tables.append(variable_table)
+
+    return extracted_contracts_descriptions, (number_tables, variable_tables)
+
+
+def restore(predictions, tables: ([dict], [dict])) -> [str]:
+    number_tables, variable_tables = tables
+    restored = []
+
+    for i, prediction in enumerate(predictions):
+        if i >= len(number_tables):
+            raise ValueError('Prediction %d has no matching placeholder tables' % (i + 1))
+        restored.append(restore_prediction(prediction, number_tables[i], variable_tables[i]))
+
+    return restored
+
+
+def save_tables(tables: ([dict], [dict]), number_table_file_name: str, variable_table_file_name: str, path_name: str = './data/'):
+    number_tables, variable_tables = tables
+    sls.write_tables_to_file(number_tables, number_table_file_name, variable_tables, variable_table_file_name, path_name)
+
+
+def load_tables(number_table_file_name: str, variable_table_file_name: str, path_name: str = './data/') -> ([dict], [dict]):
+    return sls.load_tables_from_file(number_table_file_name, variable_table_file_name, path_name)
@@ -0,0 +1,180 @@
+import argparse
+import os
+import sys
+import time
+
+from src.placeholders import extract, restore
+from src.translation_cache import cache_key
+from src.utils.instrumentation import Instrumentation
+from src.utils.paths import HELPER_PATH
+from src.utils.pipelined import iter_chunks, iter_pipelined
+from src.utils.shards import compute_file_checksum
+from src.utils.tokenizer import Tokenizer
+
+DEFAULT_MODEL_PATH = os.path.join(HELPER_PATH, 'trained.chkpt')
+DEFAULT_VOCAB_PATH = os.path.join(HELPER_PATH, 'data', 'multi30k.atok.low.pt')
+# translate_pipelined cuts the contracts into chunks of this many batches, sorted by length within each
+PIPELINED_CHUNK_BATCHES = 4
+
+
+def import_helper_modules():
+    # The helper is a standalone project whose modules import each other as top level modules
+    if HELPER_PATH not in sys.path:
+        sys.path.insert(0, HELPER_PATH)
+
+
+class TransformerPipeline:
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH, vocab_path: str = DEFAULT_VOCAB_PATH, cuda: bool = False,
+                 beam_size: int = 5, batch_size: int = 30, n_best: int = 1, cache=None,
+                 instrumentation: Instrumentation = None, decode_mode: str = 'beam', time_budget: float = None):
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation(enabled=False)
+        self.n_batches = 0
+
+        with self.instrumentation.stage('load'):
+            self.load(model_path, vocab_path, cuda, beam_size, batch_size, n_best, decode_mode, time_budget)
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer('en')
+        # A TranslationCache from encoded sources to predictions, checked before the beam search
+        self.cache = cache
+        if cache is not None:
+            cache.check_settings(self.get_cache_settings(model_path, vocab_path))
+
+    def load(self, model_path: str, vocab_path: str, cuda: bool, beam_size: int, batch_size: int, n_best: int,
+             decode_mode: str, time_budget: float):
+        import_helper_modules()
+        import torch
+        from preprocess import get_decode_length_cap
+        from transformer.Translator import Translator
+
+        preprocess_data = torch.load(vocab_path)
+        self.settings = preprocess_data['settings']
+        self.src_word2idx = preprocess_data['dict']['src']
+        self.tgt_idx2word = {idx: word for word, idx in preprocess_data['dict']['tgt'].items()}
+
+        # Each description decodes at most as many words as the training pairs suggest for its length
+        max_len_a, max_len_b = get_decode_length_cap(preprocess_data)
+        opt = argparse.Namespace(model=model_path, vocab=vocab_path, beam_size=beam_size, batch_size=batch_size,
+                                 n_best=n_best, cuda=cuda, no_cuda=not cuda, decode_mode=decode_mode,
+                                 max_len_a=max_len_a, max_len_b=max_len_b, time_budget=time_budget)
+        self.translator = Translator(opt)
+
+    def get_cache_settings(self, model_path: str, vocab_path: str) -> dict:
+        # Everything that changes the predictions for the same encoded source
+        opt = self.translator.opt
+        return {
+            'model': compute_file_checksum(model_path),
+            'vocab': compute_file_checksum(vocab_path),
+            'decode_mode': opt.decode_mode,
+            'beam_size': opt.beam_size if opt.decode_mode == 'beam' else None,
+            'max_len_a': opt.max_len_a,
+            'max_len_b': opt.max_len_b,
+        }
+
+    def tokenize(self, lines: [str]) -> [str]:
+        with self.instrumentation.stage('tokenize', len(lines)) as counts:
+            tokenized_lines = self.tokenizer.tokenize_lines(lines)
+            counts['n_tokens'] = sum(line.count(' ') + 1 for line in tokenized_lines if line)
+        return tokenized_lines
+
+    def encode(self, tokenized_lines: [str]) -> [[int]]:
+        import transformer.Constants as Constants
+
+        # Same as read_instances_from_file and convert_instance_to_idx_seq in the helper's preprocess.py
+        with self.instrumentation.stage('encode', len(tokenized_lines)) as counts:
+            insts = []
+            for line in tokenized_lines:
+                if not self.settings.keep_case:
+                    line = line.lower()
+                words = [Constants.BOS_WORD] + line.split()[:self.settings.max_word_seq_len] + [Constants.EOS_WORD]
+                insts.append([self.src_word2idx.get(word, Constants.UNK) for word in words])
+            counts['n_tokens'] = sum(map(len, insts))
+        return insts
+
+    def decode_batch(self, insts: [[int]], deadline: float = None) -> ([str], [bool]):
+        from dataset import collate_fn
+
+        self.n_batches += 1
+        # The tokens counted for the beam search are the produced ones
+        with self.instrumentation.stage('decode', len(insts), batch_index=self.n_batches - 1) as counts:
+            src_seq, src_pos = collate_fn(insts)
+            all_hyp, _ = self.translator.translate_batch(src_seq, src_pos, deadline)
+            timed_out = self.translator.last_timed_out
+            counts['n_tokens'] = sum(len(idx_seqs[0]) for idx_seqs in all_hyp)
+        # Kept exactly as the helper's translate.py writes the lines of pred.txt. The lines cut off
+        # by the time budget are flagged, they must not be cached as the translation of their source
+        return [' '.join(self.tgt_idx2word[idx] for idx in idx_seqs[0]) + '\n' for idx_seqs in all_hyp], timed_out
+
+    def decode_batches(self, insts: [[int]]) -> ([str], [bool]):
+        # Batched in order of source length, as the helper's length_bucketed_batches does, so every
+        # batch only pads to its own longest source. The results are put back in input order.
+        # The time budget is for the whole call, not for each of its batches
+        deadline = self.translator.get_deadline()
+        order = sorted(range(len(insts)), key=lambda i: len(insts[i]))
+        pred_lines = [None] * len(insts)
+        timed_out = [False] * len(insts)
+        for start in range(0, len(order), self.batch_size):
+            batch_idx = order[start: start + self.batch_size]
+            batch_pred_lines, batch_timed_out = self.decode_batch([insts[i] for i in batch_idx], deadline)
+            for i, pred_line, cut_off in zip(batch_idx, batch_pred_lines, batch_timed_out):
+                pred_lines[i] = pred_line
+                timed_out[i] = cut_off
+        return pred_lines, timed_out
+
+    def decode_uncached(self, insts: [[int]]) -> [str]:
+        return self.decode_batches(insts)[0]
+
+    def decode(self, insts: [[int]]) -> [str]:
+        if self.cache is None:
+            return self.decode_uncached(insts)
+
+        keys = [cache_key(inst) for inst in insts]
+        cached = {}
+        missing = {}
+        for key, inst in zip(keys, insts):
+            if key in cached or key in missing:
+                # Repeated within the same call, decoded at most once
+                self.cache.record_hit()
+                continue
+            pred_line = self.cache.get(key)
+            if pred_line is None:
+                missing[key] = inst
+            else:
+                cached[key] = pred_line
+
+        if missing:
+            start = time.perf_counter()
+            pred_lines, timed_out = self.decode_batches(list(missing.values()))
+            decoded = list(zip(missing, pred_lines))
+            self.cache.put_many([prediction for prediction, cut_off in zip(decoded, timed_out) if not cut_off],
+                                time.perf_counter() - start)
+            cached.update(decoded)
+
+        return [cached[key] for key in keys]
+
+    def prepare(self, contract_texts: [[str]]) -> ([[int]], ([dict], [dict])):
+        with self.instrumentation.stage('extract', len(contract_texts)):
+            extracted_contracts_descriptions, tables = extract(contract_texts)
+        return self.encode(self.tokenize(extracted_contracts_descriptions)), tables
+
+    def restore(self, pred_lines: [str], tables: ([dict], [dict])) -> [str]:
+        with self.instrumentation.stage('restore', len(pred_lines)):
+            return restore(pred_lines, tables)
+
+    def translate(self, contract_texts: [[str]]) -> [str]:
+        insts, tables = self.prepare(contract_texts)
+        return self.restore(self.decode(insts), tables)
+
+    def translate_pipelined(self, contract_texts, chunk_size: int = None, max_queue_size: int = 2):
+        # The contracts can be a stream. They are cut into chunks of a few batches, and
+        # chunk k + 1 is prepared while chunk k is decoded and chunk k - 1 restored.
+        # Each chunk is decoded in order of length, and the codes are yielded in order
+        def decode_chunk(prepared: ([[int]], ([dict], [dict]))) -> ([str], ([dict], [dict])):
+            insts, tables = prepared
+            return self.decode(insts), tables
+
+        def restore_chunk(decoded: ([str], ([dict], [dict]))) -> [str]:
+            return self.restore(*decoded)
+
+        chunks = iter_chunks(contract_texts, chunk_size or self.batch_size * PIPELINED_CHUNK_BATCHES)
+        for contract_codes in iter_pipelined(chunks, [self.prepare, decode_chunk, restore_chunk], max_queue_size):
+            yield from contract_codes
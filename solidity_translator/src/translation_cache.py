@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def cache_key(inst: [int]) -> str:
+    # The encoded source is exactly what the model sees: placeholders are
+    # extracted, the text is tokenized, lowercased and truncated, and words
+    # out of the vocabulary are already <unk>, so equal keys give equal outputs
+    # as long as the model and decoding options are those of check_settings
+    return ' '.join(map(str, inst))
+
+
+class TranslationCache:
+    def __init__(self, max_entries: int = 10000, db_path: str = None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.db_path = db_path
+        self.settings = None
+
+        # The on-disk store keeps every entry, the memory holds the most recently used ones.
+        # Keys are only meaningful for one vocabulary and model, so each model needs its own file
+        self.db = None
+        if db_path is not None:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, prediction TEXT NOT NULL)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS decode_time (id INTEGER PRIMARY KEY CHECK (id = 0), '
+                            'seconds REAL NOT NULL, n_decoded INTEGER NOT NULL)')
+            self.db.execute('INSERT OR IGNORE INTO decode_time (id, seconds, n_decoded) VALUES (0, 0, 0)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self.db.commit()
+
+        self.n_hits = 0
+        self.n_disk_hits = 0
+        self.n_misses = 0
+        # Kept with the entries so the time saved can still be estimated after a restart
+        self.decode_seconds = 0.0
+        self.n_decoded = 0
+        if self.db is not None:
+            self.decode_seconds, self.n_decoded = self.db.execute(
+                'SELECT seconds, n_decoded FROM decode_time WHERE id = 0').fetchone()
+
+    def check_settings(self, settings: dict):
+        # Outputs are only valid for the model, vocabulary and decoding options that produced
+        # them, so a file written with other settings is refused rather than read back
+        text = json.dumps(settings, sort_keys=True)
+        with self.lock:
+            if self.settings is not None and self.settings != text:
+                raise ValueError('The cache is already used with other settings: %s' % self.settings)
+            self.settings = text
+            if self.db is None:
+                return
+
+            row = self.db.execute("SELECT value FROM metadata WHERE key = 'settings'").fetchone()
+            if row is None:
+                if self.db.execute('SELECT 1 FROM translations LIMIT 1').fetchone() is not None:
+                    raise ValueError('%s holds outputs without the settings that produced them, '
+                                     'please use another cache file' % self.db_path)
+                self.db.execute("INSERT INTO metadata (key, value) VALUES ('settings', ?)", (text,))
+                self.db.commit()
+            elif row[0] != text:
+                raise ValueError('%s holds outputs of another model or decoding options (%s), '
+                                 'please use another cache file' % (self.db_path, row[0]))
+
+    def _remember(self, key: str, prediction: str):
+        self.entries[key] = prediction
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key: str):
+        with self.lock:
+            prediction = self.entries.get(key)
+            if prediction is not None:
+                self.entries.move_to_end(key)
+            elif self.db is not None:
+                row = self.db.execute('SELECT prediction FROM translations WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    prediction = row[0]
+                    self._remember(key, prediction)
+                    self.n_disk_hits += 1
+
+            if prediction is None:
+                self.n_misses += 1
+            else:
+                self.n_hits += 1
+            return prediction
+
+    def record_hit(self):
+        with self.lock:
+            self.n_hits += 1
+
+    def put_many(self, predictions: [(str, str)], decode_seconds: float = 0.0):
+        with self.lock:
+            for key, prediction in predictions:
+                self._remember(key, prediction)
+            self.decode_seconds += decode_seconds
+            self.n_decoded += len(predictions)
+            if self.db is not None:
+                self.db.executemany('INSERT OR REPLACE INTO translations (key, prediction) VALUES (?, ?)', predictions)
+                self.db.execute('UPDATE decode_time SET seconds = ?, n_decoded = ? WHERE id = 0',
+                                (self.decode_seconds, self.n_decoded))
+                self.db.commit()
+
+    def stats(self) -> dict:
+        n_lookups = self.n_hits + self.n_misses
+        seconds_per_decode = self.decode_seconds / self.n_decoded if self.n_decoded else 0.0
+        return {
+            'n_entries': len(self.entries),
+            'n_hits': self.n_hits,
+            'n_disk_hits': self.n_disk_hits,
+            'n_misses': self.n_misses,
+            'hit_rate': self.n_hits / n_lookups if n_lookups else 0.0,
+            # Estimated from the average time the model took per description that missed
+            'seconds_saved': self.n_hits * seconds_per_decode,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        return 'Cache: %d hits, %d misses (%.1f%% hit rate), about %.2fs of decoding saved' % (
+            stats['n_hits'], stats['n_misses'], stats['hit_rate'] * 100, stats['seconds_saved'])
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
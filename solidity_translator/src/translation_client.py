@@ -0,0 +1,68 @@
+import http.client
+import json
+import socket
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float = None):
+        http.client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class TranslationClient:
+    def __init__(self, host: str = '127.0.0.1', port: int = 8000, socket_path: str = None, timeout: float = None):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connection = None
+
+    def connect(self) -> http.client.HTTPConnection:
+        # The connection is kept alive across requests
+        if self.connection is None:
+            if self.socket_path is not None:
+                self.connection = UnixHTTPConnection(self.socket_path, self.timeout)
+            else:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self.connection
+
+    def request(self, method: str, path: str, body: dict = None) -> dict:
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        try:
+            connection = self.connect()
+            connection.request(method, path, data, headers)
+            response = connection.getresponse()
+            result = json.loads(response.read().decode('utf-8'))
+        except (http.client.HTTPException, OSError):
+            self.close()
+            raise
+
+        if response.status != 200:
+            raise RuntimeError('The server answered %d: %s' % (response.status, result.get('error')))
+        return result
+
+    def health(self) -> dict:
+        return self.request('GET', '/health')
+
+    def translate(self, contract_texts: [[str]], method: str = 'rule') -> [str]:
+        # Sent as lists of lines, exactly as load_sample_texts gives them to the local translation
+        texts = [list(contract_text) for contract_text in contract_texts]
+        return self.request('POST', '/translate', {'method': method, 'texts': texts})['codes']
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,173 @@
+import json
+import os
+import socket
+import socketserver
+import stat
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from src.batching_scheduler import BatchingScheduler
+from src.hybrid_translation import translate_hybrid
+from src.language_rules.templates import DefineContract
+from src.utils.general_utils import beautify_contract_codes
+
+METHODS = ['rule', 'transformer', 'hybrid']
+
+
+def split_text(text) -> [str]:
+    # A description is sent either as one string or as its list of lines, which are
+    # translated without their line endings like the lines of load_sample_texts
+    if isinstance(text, str):
+        return text.splitlines()
+    if not isinstance(text, list) or not all(isinstance(line, str) for line in text):
+        raise ValueError('Every text must be a string or a list of lines')
+    return [line.rstrip('\r\n') for line in text]
+
+
+def parse_request(request) -> ([[str]], str):
+    if not isinstance(request, dict):
+        raise ValueError('The request must be a JSON object')
+    texts = request.get('texts')
+    if not isinstance(texts, list):
+        raise ValueError('"texts" must be a list of descriptions')
+    method = request.get('method', 'rule')
+    if not isinstance(method, str):
+        raise ValueError('"method" must be a string')
+    return [split_text(text) for text in texts], method
+
+
+def is_socket(path: str) -> bool:
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class TranslationService:
+    def __init__(self, pipeline=None, max_batch_size: int = 30, max_wait_seconds: float = 0.01):
+        self.pipeline = pipeline
+        # Concurrent transformer requests share batched beam searches on one thread
+        self.scheduler = BatchingScheduler(pipeline, max_batch_size, max_wait_seconds) if pipeline is not None else None
+        self.n_requests = 0
+        self.n_contracts = 0
+
+    def methods(self) -> [str]:
+        return METHODS if self.pipeline is not None else ['rule']
+
+    def translate(self, contract_texts: [[str]], method: str) -> [str]:
+        if method not in self.methods():
+            raise ValueError('The method %s is not served, use one of %s' % (method, ', '.join(self.methods())))
+
+        self.n_requests += 1
+        self.n_contracts += len(contract_texts)
+        if method == 'rule':
+            return [beautify_contract_codes(DefineContract.parse_template_from_text(contract_text).convert_to_solidity())
+                    for contract_text in contract_texts]
+
+        if method == 'hybrid':
+            return translate_hybrid(contract_texts, self.scheduler.translate)[0]
+        return self.scheduler.translate(contract_texts)
+
+    def status(self) -> dict:
+        status = {'status': 'ok', 'methods': self.methods(), 'n_requests': self.n_requests,
+                  'n_contracts': self.n_contracts}
+        if self.scheduler is not None:
+            status['scheduler'] = self.scheduler.metrics()
+        if self.pipeline is not None:
+            status['decode'] = {'n_length_capped': self.pipeline.translator.n_length_capped,
+                                'n_timed_out': self.pipeline.translator.n_timed_out}
+        if self.pipeline is not None and self.pipeline.cache is not None:
+            status['cache'] = self.pipeline.cache.stats()
+        return status
+
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+        if self.pipeline is not None and self.pipeline.cache is not None:
+            self.pipeline.cache.close()
+
+
+class TranslationRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, code: int, body: dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_json(404, {'error': 'Unknown path %s' % self.path})
+            return
+        self.send_json(200, self.server.service.status())
+
+    def do_POST(self):
+        if self.path != '/translate':
+            self.send_json(404, {'error': 'Unknown path %s' % self.path})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            contract_texts, method = parse_request(json.loads(self.rfile.read(length).decode('utf-8')))
+        except ValueError as e:
+            self.send_json(400, {'error': 'Malformed request: %s' % e})
+            return
+
+        try:
+            codes = self.server.service.translate(contract_texts, method)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            # The rule parser has no error type of its own, a description it
+            # cannot parse fails with whatever the templates raise
+            self.send_json(422, {'error': '%s: %s' % (type(e).__name__, e)})
+            return
+
+        self.send_json(200, {'codes': codes})
+
+    def address_string(self) -> str:
+        # Unix socket peers have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class TranslationHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, service: TranslationService, quiet: bool = False):
+        self.service = service
+        self.quiet = quiet
+        HTTPServer.__init__(self, server_address, TranslationRequestHandler)
+
+
+class UnixTranslationHTTPServer(TranslationHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        # Only a socket left by a previous server is replaced, never another file at a mistyped path
+        if is_socket(self.server_address):
+            os.remove(self.server_address)
+        elif os.path.lexists(self.server_address):
+            raise FileExistsError('%s exists and is not a socket' % self.server_address)
+        socketserver.TCPServer.server_bind(self)
+        # HTTPServer.server_bind expects a (host, port) address
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+    def server_close(self):
+        TranslationHTTPServer.server_close(self)
+        if is_socket(self.server_address):
+            os.remove(self.server_address)
+
+
+def make_server(service: TranslationService, host: str = '127.0.0.1', port: int = 8000, socket_path: str = None,
+                quiet: bool = False) -> TranslationHTTPServer:
+    if socket_path is not None:
+        return UnixTranslationHTTPServer(socket_path, service, quiet)
+    return TranslationHTTPServer((host, port), service, quiet)
@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+
+from src.utils.compressed_io import open_file
+from src.utils.sample_loader_saver import format_item
+
+_CLOSE = object()
+
+
+class BackgroundWriter:
+    def __init__(self, file_path: str, max_queue_size: int = 1024, max_batch_size: int = 256, mode: str = 'w'):
+        self.file = open_file(file_path, mode)
+        self.queue = queue.Queue(max_queue_size)
+        self.max_batch_size = max_batch_size
+
+        # Time producers spent blocked on a full queue, i.e. write latency that was not hidden
+        self.producer_wait_seconds = 0.0
+        self.n_blocked_writes = 0
+        self.n_items = 0
+        self.n_batches = 0
+        self.error = None
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, text: str):
+        if self.error is not None:
+            raise self.error
+        try:
+            self.queue.put_nowait(text)
+        except queue.Full:
+            start = time.perf_counter()
+            self.queue.put(text)
+            self.producer_wait_seconds += time.perf_counter() - start
+            self.n_blocked_writes += 1
+
+    def _run(self):
+        closing = False
+        while not closing:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if batch[-1] is _CLOSE:
+                batch.pop()
+                closing = True
+
+            if self.error is not None:
+                continue
+            try:
+                self.file.write(''.join(batch))
+                self.file.flush()
+                self.n_items += len(batch)
+                self.n_batches += 1
+            except Exception as e:
+                # Any failure, not only OSError, e.g. UnicodeEncodeError. Keep draining so producers
+                # never block forever, the error is raised on their side
+                self.error = e
+
+    def close(self):
+        self.queue.put(_CLOSE)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_items_to_file_in_background(items, file_name, path_name='../data/', formatize=True,
+                                      max_queue_size: int = 1024) -> BackgroundWriter:
+    with BackgroundWriter(path_name + file_name, max_queue_size) as writer:
+        for item in items:
+            writer.write(format_item(item, formatize))
+    return writer
@@ -0,0 +1,124 @@
+import mmap
+import struct
+import zlib
+
+# Layout of a binary corpus file:
+#   MAGIC
+#   record * n        record = flag (1 byte) + payload length (uint32) + payload
+#   offset * n        uint64 byte offset of every record, the index footer
+#   n, index_start    uint64 each
+#   MAGIC
+BINARY_CORPUS_MAGIC = b'STCORP01'
+
+RECORD_RAW = 0
+RECORD_ZLIB = 1
+
+_RECORD_HEADER = struct.Struct('<BI')
+_OFFSET = struct.Struct('<Q')
+_TRAILER = struct.Struct('<QQ')
+_TRAILER_SIZE = _TRAILER.size + len(BINARY_CORPUS_MAGIC)
+
+
+def is_binary_corpus(file_name: str, path_name: str = '../data/') -> bool:
+    try:
+        with open(path_name + file_name, 'rb') as file:
+            return file.read(len(BINARY_CORPUS_MAGIC)) == BINARY_CORPUS_MAGIC
+    except OSError:
+        return False
+
+
+def write_items_to_binary_file(items, file_name, path_name='../data/', compress=False, compress_level=6):
+    offsets = []
+
+    with open(path_name + file_name, 'wb') as file:
+        file.write(BINARY_CORPUS_MAGIC)
+        position = len(BINARY_CORPUS_MAGIC)
+
+        for item in items:
+            if not item.endswith('\n'):
+                item += '\n'
+            payload = item.encode('utf-8')
+            flag = RECORD_RAW
+            if compress:
+                compressed = zlib.compress(payload, compress_level)
+                # Short records may grow when compressed, keep whichever is smaller
+                if len(compressed) < len(payload):
+                    payload = compressed
+                    flag = RECORD_ZLIB
+
+            offsets.append(position)
+            file.write(_RECORD_HEADER.pack(flag, len(payload)))
+            file.write(payload)
+            position += _RECORD_HEADER.size + len(payload)
+
+        index_start = position
+        for offset in offsets:
+            file.write(_OFFSET.pack(offset))
+        file.write(_TRAILER.pack(len(offsets), index_start))
+        file.write(BINARY_CORPUS_MAGIC)
+
+    return len(offsets)
+
+
+class BinaryCorpusReader:
+    def __init__(self, file_name: str, path_name: str = '../data/'):
+        self.file = open(path_name + file_name, 'rb')
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap refuses empty files, which are never valid corpora anyway
+            self.file.close()
+            raise ValueError('%s is not a binary corpus file' % (path_name + file_name))
+
+        size = len(self.buffer)
+        if size < len(BINARY_CORPUS_MAGIC) + _TRAILER_SIZE or \
+                self.buffer[:len(BINARY_CORPUS_MAGIC)] != BINARY_CORPUS_MAGIC or \
+                self.buffer[size - len(BINARY_CORPUS_MAGIC):] != BINARY_CORPUS_MAGIC:
+            self.close()
+            raise ValueError('%s is not a binary corpus file' % (path_name + file_name))
+
+        self.n_items, self.index_start = _TRAILER.unpack_from(self.buffer, size - _TRAILER_SIZE)
+
+    def __len__(self):
+        return self.n_items
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += self.n_items
+        if i < 0 or i >= self.n_items:
+            raise IndexError('item index out of range')
+
+        offset, = _OFFSET.unpack_from(self.buffer, self.index_start + i * _OFFSET.size)
+        flag, length = _RECORD_HEADER.unpack_from(self.buffer, offset)
+        start = offset + _RECORD_HEADER.size
+        payload = self.buffer[start: start + length]
+        if flag == RECORD_ZLIB:
+            payload = zlib.decompress(payload)
+        return payload.decode('utf-8')
+
+    def __iter__(self):
+        for i in range(self.n_items):
+            yield self[i]
+
+    def read_item_lines(self, i: int) -> [str]:
+        return self[i].splitlines(keepends=True)
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_binary_item(file_name: str, i: int, path_name: str = '../data/') -> str:
+    with BinaryCorpusReader(file_name, path_name) as reader:
+        return reader[i]
+
+
+def read_items_from_binary_file(file_name: str, path_name: str = '../data/') -> [[str]]:
+    with BinaryCorpusReader(file_name, path_name) as reader:
+        return [reader.read_item_lines(i) for i in range(len(reader))]
@@ -0,0 +1,35 @@
+import bz2
+import gzip
+import lzma
+
+COMPRESSED_OPENERS = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+    '.bz2': bz2.open,
+}
+
+
+def get_compression_suffix(file_name: str):
+    for suffix in COMPRESSED_OPENERS:
+        if file_name.endswith(suffix):
+            return suffix
+    return None
+
+
+def is_compressed(file_name: str) -> bool:
+    return get_compression_suffix(file_name) is not None
+
+
+def open_file(file_path: str, mode: str = 'r', compresslevel: int = None, encoding: str = None, newline: str = None):
+    # Compressed files are streamed through the stdlib codecs, nothing is
+    # decompressed to a temporary file first
+    suffix = get_compression_suffix(file_path)
+    if suffix is None:
+        return open(file_path, mode, encoding=encoding, newline=newline)
+
+    if 'b' not in mode and 't' not in mode:
+        mode += 't'
+    kwargs = {'encoding': encoding, 'newline': newline}
+    if compresslevel is not None and 'r' not in mode:
+        kwargs['preset' if suffix == '.xz' else 'compresslevel'] = compresslevel
+    return COMPRESSED_OPENERS[suffix](file_path, mode, **kwargs)
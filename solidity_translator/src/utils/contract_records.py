@@ -0,0 +1,44 @@
+import json
+
+from src.utils.compressed_io import get_compression_suffix, open_file
+
+RECORD_FILE_SUFFIX = '.jsonl'
+
+
+def is_contract_record_file(file_name: str) -> bool:
+    suffix = get_compression_suffix(file_name)
+    if suffix is not None:
+        file_name = file_name[:-len(suffix)]
+    return file_name.endswith(RECORD_FILE_SUFFIX)
+
+
+def make_contract_record(description: [str], code: str = None, extracted_description: str = None,
+                         number_table: dict = None, variable_table: dict = None) -> dict:
+    return {
+        'description': description,
+        'code': code,
+        'extracted_description': extracted_description,
+        'number_table': number_table if number_table is not None else {},
+        'variable_table': variable_table if variable_table is not None else {},
+    }
+
+
+def write_contract_records(records, file_name: str, path_name: str = './data/') -> int:
+    n_records = 0
+    with open_file(path_name + file_name, 'w') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write('\n')
+            n_records += 1
+    return n_records
+
+
+def iter_contract_records(file_name: str, path_name: str = './data/'):
+    with open_file(path_name + file_name, 'r') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_contract_records(file_name: str, path_name: str = './data/') -> [dict]:
+    return list(iter_contract_records(file_name, path_name))
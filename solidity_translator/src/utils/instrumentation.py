@@ -0,0 +1,163 @@
+import csv
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from src.utils.options import pop_flag, pop_option
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def get_peak_memory_bytes() -> int:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def get_peak_cuda_memory_bytes() -> int:
+    # torch is never imported just for this, only read when the caller already uses it
+    torch = sys.modules.get('torch')
+    if torch is None or not torch.cuda.is_available():
+        return None
+    return torch.cuda.max_memory_allocated()
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.n_calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.n_items = 0
+        self.n_tokens = 0
+
+    def add(self, seconds: float, n_items: int, n_tokens: int):
+        self.n_calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.n_items += n_items
+        self.n_tokens += n_tokens
+
+    def to_dict(self) -> dict:
+        return {
+            'stage': self.name,
+            'n_calls': self.n_calls,
+            'seconds': self.seconds,
+            'max_seconds': self.max_seconds,
+            'n_items': self.n_items,
+            'n_tokens': self.n_tokens,
+            'items_per_second': self.n_items / self.seconds if self.seconds else 0.0,
+            'tokens_per_second': self.n_tokens / self.seconds if self.seconds else 0.0,
+        }
+
+
+class Instrumentation:
+    def __init__(self, enabled: bool = True, record_batches: bool = True):
+        self.enabled = enabled
+        self.record_batches = record_batches
+        self.stages = {}
+        self.batches = []
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+
+    def record(self, stage: str, seconds: float, n_items: int = 0, n_tokens: int = 0, batch_index: int = None):
+        if not self.enabled:
+            return
+        with self.lock:
+            if stage not in self.stages:
+                self.stages[stage] = StageStats(stage)
+            self.stages[stage].add(seconds, n_items, n_tokens)
+            if batch_index is not None and self.record_batches:
+                self.batches.append({'stage': stage, 'batch': batch_index, 'seconds': seconds,
+                                     'n_items': n_items, 'n_tokens': n_tokens})
+
+    @contextmanager
+    def stage(self, name: str, n_items: int = 0, n_tokens: int = 0, batch_index: int = None):
+        # The counts can also be filled in while the stage runs through the yielded dict
+        counts = {'n_items': n_items, 'n_tokens': n_tokens}
+        if not self.enabled:
+            yield counts
+            return
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.record(name, time.perf_counter() - start, counts['n_items'], counts['n_tokens'], batch_index)
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self) -> dict:
+        return {
+            'wall_seconds': time.perf_counter() - self.start_time,
+            'peak_memory_bytes': get_peak_memory_bytes(),
+            'peak_cuda_memory_bytes': get_peak_cuda_memory_bytes(),
+            'stages': [stats.to_dict() for stats in self.stages.values()],
+            'batches': list(self.batches),
+            'counters': dict(self.counters),
+        }
+
+    def write_report(self, file_path: str):
+        # The format follows the extension, csv holds one row per stage and per batch
+        report = self.report()
+        if file_path.endswith('.csv'):
+            fields = ['kind', 'stage', 'batch', 'n_calls', 'seconds', 'max_seconds', 'n_items', 'n_tokens',
+                      'items_per_second', 'tokens_per_second']
+            with open(file_path, 'w', newline='') as file:
+                writer = csv.DictWriter(file, fields, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerow({'kind': 'total', 'stage': 'wall', 'seconds': report['wall_seconds']})
+                for stats in report['stages']:
+                    writer.writerow(dict(stats, kind='stage'))
+                for batch in report['batches']:
+                    writer.writerow(dict(batch, kind='batch'))
+                for name, value in report['counters'].items():
+                    writer.writerow({'kind': 'counter', 'stage': name, 'n_items': value})
+                for name in ['peak_memory_bytes', 'peak_cuda_memory_bytes']:
+                    if report[name] is not None:
+                        writer.writerow({'kind': 'memory', 'stage': name, 'n_items': report[name]})
+        else:
+            with open(file_path, 'w') as file:
+                json.dump(report, file, indent=2)
+
+    def summary(self) -> str:
+        report = self.report()
+        lines = ['%-16s %8s %10s %10s %10s %12s' % ('stage', 'calls', 'seconds', 'share', 'items', 'tokens/s')]
+        for stats in report['stages']:
+            share = stats['seconds'] / report['wall_seconds'] if report['wall_seconds'] else 0.0
+            lines.append('%-16s %8d %10.3f %9.1f%% %10d %12.1f' % (
+                stats['stage'], stats['n_calls'], stats['seconds'], share * 100, stats['n_items'],
+                stats['tokens_per_second']))
+        lines.append('wall %.3fs' % report['wall_seconds'])
+        if report['peak_memory_bytes'] is not None:
+            lines.append('peak memory %.1f MB' % (report['peak_memory_bytes'] / 2 ** 20))
+        if report['peak_cuda_memory_bytes'] is not None:
+            lines.append('peak cuda memory %.1f MB' % (report['peak_cuda_memory_bytes'] / 2 ** 20))
+        for name, value in report['counters'].items():
+            lines.append('%s %d' % (name, value))
+        return '\n'.join(lines)
+
+
+def pop_report_option(argv: [str]):
+    # Shared by the scripts: '--report PATH' writes the report, '--summary' prints it
+    report_path = pop_option(argv, '--report', description='the path of the report (.json or .csv)')
+    print_summary = pop_flag(argv, '--summary')
+    return Instrumentation(enabled=report_path is not None or print_summary), report_path, print_summary
+
+
+def finish_report(instrumentation: Instrumentation, report_path: str, print_summary: bool):
+    if report_path is not None:
+        instrumentation.write_report(report_path)
+    if print_summary:
+        print(instrumentation.summary())
@@ -0,0 +1,128 @@
+import mmap
+import os
+import struct
+from array import array
+
+ITEM_SEPARATOR = b'*******************************************'
+INDEX_SUFFIX = '.idx'
+
+# Sidecar layout: MAGIC, source size, source mtime_ns, n items, then n + 1
+# uint64 offsets. Item i spans offsets[i] up to the separator line, ended by
+# '\n' or '\r\n', that ends right before offsets[i + 1].
+INDEX_MAGIC = b'STCIDX02'
+_HEADER = struct.Struct('<8sQQQ')
+
+
+def find_item_offsets(buffer) -> array:
+    offsets = array('Q', [0])
+    position = 0
+    while True:
+        position = buffer.find(ITEM_SEPARATOR, position)
+        if position == -1:
+            break
+        position += len(ITEM_SEPARATOR)
+        # A separator only counts when it fills a whole line, as the text-mode reader sees it
+        if position == len(ITEM_SEPARATOR) or buffer[position - len(ITEM_SEPARATOR) - 1] == ord('\n'):
+            if buffer[position: position + 1] == b'\n':
+                offsets.append(position + 1)
+            elif buffer[position: position + 2] == b'\r\n':
+                offsets.append(position + 2)
+    return offsets
+
+
+def build_item_index(file_name: str, path_name: str = '../data/') -> int:
+    # Returns the number of items, or None when the sidecar cannot be written, e.g. in a read-only directory
+    source_path = path_name + file_name
+    stat = os.stat(source_path)
+
+    with open(source_path, 'rb') as file:
+        if stat.st_size == 0:
+            offsets = array('Q', [0])
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                offsets = find_item_offsets(buffer)
+
+    try:
+        with open(source_path + INDEX_SUFFIX, 'wb') as index_file:
+            index_file.write(_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(offsets) - 1))
+            offsets.tofile(index_file)
+    except OSError:
+        try:
+            os.remove(source_path + INDEX_SUFFIX)
+        except OSError:
+            pass
+        return None
+
+    return len(offsets) - 1
+
+
+def load_item_index(file_name: str, path_name: str = '../data/', rebuild_if_stale: bool = True) -> array:
+    source_path = path_name + file_name
+    stat = os.stat(source_path)
+
+    try:
+        with open(source_path + INDEX_SUFFIX, 'rb') as index_file:
+            magic, size, mtime_ns, n_items = _HEADER.unpack(index_file.read(_HEADER.size))
+            if magic == INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                offsets = array('Q')
+                offsets.fromfile(index_file, n_items + 1)
+                return offsets
+    except (OSError, struct.error, EOFError):
+        pass
+
+    if not rebuild_if_stale:
+        raise ValueError('The index of %s is missing or out of date' % source_path)
+    if build_item_index(file_name, path_name) is None:
+        raise ValueError('The index of %s cannot be saved' % source_path)
+    return load_item_index(file_name, path_name, rebuild_if_stale=False)
+
+
+class IndexedItemFile:
+    def __init__(self, file_name: str, path_name: str = '../data/'):
+        self.offsets = load_item_index(file_name, path_name)
+        self.file = open(path_name + file_name, 'rb')
+        self.buffer = None
+        if len(self.offsets) > 1:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def read_item(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('item index out of range')
+        start = self.offsets[i]
+        end = self.buffer.rfind(ITEM_SEPARATOR, start, self.offsets[i + 1])
+        # Newlines are translated like the text-mode reader does
+        return self.buffer[start: end].decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+    def read_item_lines(self, i: int) -> [str]:
+        return self.read_item(i).splitlines(keepends=True)
+
+    def iter_items(self, start: int = 0, stop: int = None):
+        start, stop, _ = slice(start, stop).indices(len(self))
+        for i in range(start, stop):
+            yield self.read_item(i)
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_item(file_name: str, i: int, path_name: str = '../data/') -> str:
+    with IndexedItemFile(file_name, path_name) as indexed_file:
+        return indexed_file.read_item(i)
+
+
+def iter_items(file_name: str, start: int = 0, stop: int = None, path_name: str = '../data/'):
+    with IndexedItemFile(file_name, path_name) as indexed_file:
+        yield from indexed_file.iter_items(start, stop)
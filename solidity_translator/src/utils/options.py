@@ -0,0 +1,20 @@
+def pop_option(argv: [str], name: str, default=None, value_type=str, description: str = 'a value'):
+    # Shared by the scripts: removes 'name value' from argv and returns the value converted by
+    # value_type, or default when the option is not given. A missing or invalid value exits
+    if name not in argv:
+        return default
+    i = argv.index(name)
+    try:
+        value = value_type(argv[i + 1])
+    except (IndexError, ValueError):
+        print('Please give %s after %s.' % (description, name))
+        exit(1)
+    del argv[i: i + 2]
+    return value
+
+
+def pop_flag(argv: [str], name: str) -> bool:
+    if name not in argv:
+        return False
+    argv.remove(name)
+    return True
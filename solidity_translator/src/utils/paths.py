@@ -0,0 +1,5 @@
+import os
+
+# The transformer helper, a standalone project kept in the repository
+HELPER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           'third_party_helper', 'attention-is-all-you-need-pytorch-master')
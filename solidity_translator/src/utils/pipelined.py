@@ -0,0 +1,89 @@
+import queue
+import threading
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def iter_chunks(items, chunk_size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_pipelined(items, stages, max_queue_size: int = 2):
+    # Each stage runs on its own thread and hands its results to the next one
+    # through a bounded queue, so stage k works on item i while stage k + 1 works
+    # on item i - 1. One thread per stage keeps the items in order. Threads help
+    # because torch and file io release the GIL, so the pure Python stages
+    # (regexes included) overlap with those but not with each other
+    stop = threading.Event()
+    queues = [queue.Queue(max_queue_size) for _ in range(len(stages) + 1)]
+
+    def put(q: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(q: queue.Queue):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _END
+
+    def feed():
+        try:
+            for item in items:
+                if not put(queues[0], item):
+                    return
+        except BaseException as e:
+            put(queues[0], _Failure(e))
+            return
+        put(queues[0], _END)
+
+    def work(stage, input_queue: queue.Queue, output_queue: queue.Queue):
+        while True:
+            item = get(input_queue)
+            if item is not _END and not isinstance(item, _Failure):
+                try:
+                    item = stage(item)
+                except BaseException as e:
+                    item = _Failure(e)
+            if not put(output_queue, item) or item is _END or isinstance(item, _Failure):
+                return
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for k, stage in enumerate(stages):
+        threads.append(threading.Thread(target=work, args=(stage, queues[k], queues[k + 1]), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Also reached when the consumer stops early, the workers then give up
+        # on their next put or get, after finishing the item at hand
+        stop.set()
+        for thread in threads:
+            thread.join()
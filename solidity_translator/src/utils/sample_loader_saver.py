@@ -1,8 +1,9 @@
-from functools import reduce
-from src.language_rules.templates import DefineContract
 from src.utils.general_utils import beautify_contract_codes
+from src.utils.binary_corpus import BinaryCorpusReader, is_binary_corpus
+from src.utils.compressed_io import is_compressed, open_file
+from src.utils.item_index import IndexedItemFile
 
-def save_samples_to_files(contracts: [DefineContract], text_file_name: str = None, code_file_name: str = None):
+def save_samples_to_files(contracts: '[DefineContract]', text_file_name: str = None, code_file_name: str = None):
     contract_texts = list(map(lambda contract: contract.convert_to_text(), contracts))
     contract_codes = list(map(lambda contract: beautify_contract_codes(contract.convert_to_solidity()), contracts))
 
@@ -12,56 +13,91 @@ def save_samples_to_files(contracts: [DefineContract], text_file_name: str = Non
         write_items_to_file(contract_codes, code_file_name)
 
 
+def format_item(item: str, formatize: bool = True) -> str:
+    if not formatize:
+        return item.strip('').replace('\n', ' \\n ') + '\n'
+    if item[len(item) - 1] != '\n':
+        return item.strip('') + '\n*******************************************\n'
+    return item.strip('') + '*******************************************\n'
+
+
 def write_items_to_file(items, file_name, path_name='../data/', formatize=True):
-    file = open(path_name + file_name, 'w')
+    file = open_file(path_name + file_name, 'w')
 
     for item in items:
-        file.write(item.strip('') if formatize else item.strip('').replace('\n', ' \\n '))
-        if item[len(item) - 1] != '\n' and formatize:
-            file.write('\n')
-        if formatize:
-            file.write('*******************************************\n')
-        else:
-            file.write('\n')
+        file.write(format_item(item, formatize))
     file.close()
 
 
-def load_sample_texts(text_file_name: str, path_name: str = '../data/') -> [[str]]:
-    texts_lines = read_items_from_file(text_file_name, path_name)
-    contract_texts = []
-
-    for text_lines in texts_lines:
-        for i in range(len(text_lines)):
-            text_lines[i] = text_lines[i].strip('\n')
-        contract_texts.append(text_lines)
-
-    return contract_texts
-
-
-def load_sample_codes(code_file_name: str, path_name: str = '../data/') -> [[str]]:
-    codes_lines = read_items_from_file(code_file_name, path_name)
-    contract_codes = []
-
-    for code_lines in codes_lines:
-        contract_codes.append(reduce(lambda s1, s2: s1 + s2, code_lines))
-    return contract_codes
+def iter_sample_texts(text_file_name: str, path_name: str = '../data/', start: int = 0, stop: int = None):
+    for text_lines in iter_items_from_file(text_file_name, path_name, start, stop):
+        yield [text_line.strip('\n') for text_line in text_lines]
+
+
+def iter_sample_codes(code_file_name: str, path_name: str = '../data/', start: int = 0, stop: int = None):
+    for code_lines in iter_items_from_file(code_file_name, path_name, start, stop):
+        yield ''.join(code_lines)
+
+
+def load_sample_texts(text_file_name: str, path_name: str = '../data/', start: int = 0, stop: int = None) -> [[str]]:
+    return list(iter_sample_texts(text_file_name, path_name, start, stop))
+
+
+def load_sample_codes(code_file_name: str, path_name: str = '../data/', start: int = 0, stop: int = None) -> [str]:
+    return list(iter_sample_codes(code_file_name, path_name, start, stop))
+
+
+def iter_items_from_file(file_name: str, path_name: str = '../data/', start: int = 0, stop: int = None):
+    if is_binary_corpus(file_name, path_name):
+        with BinaryCorpusReader(file_name, path_name) as reader:
+            start, stop, _ = slice(start, stop).indices(len(reader))
+            for i in range(start, stop):
+                yield reader.read_item_lines(i)
+        return
+
+    # Slices are served through the offset index instead of parsing the whole file,
+    # compressed files cannot be memory-mapped and are parsed as a stream instead,
+    # as are files whose index cannot be saved, e.g. in a read-only directory
+    indexed_file = None
+    if (start != 0 or stop is not None) and not is_compressed(file_name):
+        try:
+            indexed_file = IndexedItemFile(file_name, path_name)
+        except ValueError:
+            pass
+    if indexed_file is not None:
+        with indexed_file:
+            start, stop, _ = slice(start, stop).indices(len(indexed_file))
+            for i in range(start, stop):
+                yield indexed_file.read_item_lines(i)
+        return
+
+    if start < 0 or (stop is not None and stop < 0):
+        # Negative bounds are relative to the end, which a stream only knows once it is exhausted
+        yield from list(iter_items_from_file(file_name, path_name))[start:stop]
+        return
+
+    with open_file(path_name + file_name, 'r') as file:
+        item = []
+        n_items = 0
+        for line in file:
+            if line != '*******************************************\n':
+                item.append(line)
+                continue
+
+            if n_items >= start:
+                yield item
+            n_items += 1
+            if stop is not None and n_items >= stop:
+                return
+            item = []
 
 
-def read_items_from_file(file_name: str, path_name: str = '../data/') -> [[str]]:
-    file = open(path_name + file_name, 'r')
-    items = []
-    item = []
+def read_items_from_file(file_name: str, path_name: str = '../data/', start: int = 0, stop: int = None) -> [[str]]:
+    return list(iter_items_from_file(file_name, path_name, start, stop))
 
-    for line in file:
-        if line != '*******************************************\n':
-            item.append(line)
-        else:
-            items.append(item)
-            item = []
-    return items
 
 def write_tables_to_file(number_tables: [dict], number_table_file_name: str, variable_tables: [dict], variable_table_file_name, path_name: str = './data/'):
-    file = open(path_name + number_table_file_name, 'w')
+    file = open_file(path_name + number_table_file_name, 'w')
     for number_table in number_tables:
         for k in number_table:
             v = number_table[k]
@@ -70,7 +106,7 @@ def write_tables_to_file(number_tables: [dict], number_table_file_name: str, var
     
     file.close()
 
-    file = open(path_name + variable_table_file_name, 'w')
+    file = open_file(path_name + variable_table_file_name, 'w')
     for variable_table in variable_tables:
         for k in variable_table:
             v = variable_table[k]
@@ -80,7 +116,7 @@ def write_tables_to_file(number_tables: [dict], number_table_file_name: str, var
     file.close()
     
 def write_extracted_contracts_descriptions_to_file(extracted_contracts_descriptions: [str], file_name: str, path_name: str = './data/'):
-    file = open(path_name + file_name, 'w')
+    file = open_file(path_name + file_name, 'w')
     
     for extracted_contracts_description in extracted_contracts_descriptions:
         file.write(extracted_contracts_description)
@@ -88,44 +124,29 @@ def write_extracted_contracts_descriptions_to_file(extracted_contracts_descripti
         
     file.close()
 
-def read_lines_from_file(file_name: str, path_name: str='./data/') -> [str]:
-    file = open(path_name + file_name, 'r')
-
-    lines = []
-    for line in file:
-        lines.append(line)
+def iter_lines_from_file(file_name: str, path_name: str='./data/'):
+    with open_file(path_name + file_name, 'r') as file:
+        yield from file
 
-    file.close()
-    return lines
+def read_lines_from_file(file_name: str, path_name: str='./data/') -> [str]:
+    return list(iter_lines_from_file(file_name, path_name))
 
-def load_tables_from_file(number_tabel_file_name: str, variable_tabel_file_name, path_name: str= './data/') -> [dict]:
+def load_tables_from_file(number_tabel_file_name: str, variable_tabel_file_name, path_name: str= './data/',
+                          start: int = 0, stop: int = None) -> [dict]:
     number_tables = []
-    number_table = {}
-
-    variable_tabels = []
-    variable_tabel = {}
-
-    file = open(path_name + number_tabel_file_name, 'r')
-    for line in file:
-        if line != '*******************************************\n':
+    for number_table_lines in read_items_from_file(number_tabel_file_name, path_name, start, stop):
+        number_table = {}
+        for line in number_table_lines:
             k, v = line.split(',')
-            v = int(v)
-            number_table[k] = v
-        else:
-            number_tables.append(number_table)
-            number_table = {}
+            number_table[k] = int(v)
+        number_tables.append(number_table)
 
-    file.close()
-
-    file = open(path_name + variable_tabel_file_name, 'r')
-    for line in file:
-        if line != '*******************************************\n':
+    variable_tabels = []
+    for variable_tabel_lines in read_items_from_file(variable_tabel_file_name, path_name, start, stop):
+        variable_tabel = {}
+        for line in variable_tabel_lines:
             k, v = line.split(',')
             variable_tabel[k] = v.strip('\n')
-        else:
-            variable_tabels.append(variable_tabel)
-            variable_tabel = {}
-
-    file.close()
+        variable_tabels.append(variable_tabel)
 
-    return number_tables, variable_tabels
\ No newline at end of file
+    return number_tables, variable_tabels
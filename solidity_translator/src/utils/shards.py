@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+
+from src.utils.compressed_io import open_file
+from src.utils.sample_loader_saver import format_item
+
+MANIFEST_SUFFIX = '.manifest.json'
+CLAIM_SUFFIX = '.claim'
+
+
+def shard_file_name(file_name: str, shard_index: int, n_shards: int) -> str:
+    # The shard number goes before the extensions so 'train.en' becomes
+    # 'train-00000-of-00004.en' and compression suffixes are kept
+    dot = file_name.find('.')
+    if dot == -1:
+        dot = len(file_name)
+    return '%s-%05d-of-%05d%s' % (file_name[:dot], shard_index, n_shards, file_name[dot:])
+
+
+def manifest_file_name(file_name: str) -> str:
+    return file_name + MANIFEST_SUFFIX
+
+
+def compute_file_checksum(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def write_sharded_items(items, file_name: str, n_shards: int, path_name: str = '../data/', formatize: bool = True) -> dict:
+    if n_shards < 1:
+        raise ValueError('The number of shards must be at least 1')
+
+    shard_names = [shard_file_name(file_name, k, n_shards) for k in range(n_shards)]
+    shard_counts = [0] * n_shards
+    shard_files = [open_file(path_name + name, 'w') for name in shard_names]
+
+    # Items are dealt round robin, so streams written from the same samples
+    # (descriptions and codes) stay aligned shard by shard
+    try:
+        for i, item in enumerate(items):
+            shard_files[i % n_shards].write(format_item(item, formatize))
+            shard_counts[i % n_shards] += 1
+    finally:
+        for shard_file in shard_files:
+            shard_file.close()
+
+    manifest = {
+        'file_name': file_name,
+        'n_shards': n_shards,
+        'n_items': sum(shard_counts),
+        'formatize': formatize,
+        'assignment': 'round_robin',
+        'shards': [{
+            'index': k,
+            'file_name': shard_names[k],
+            'n_items': shard_counts[k],
+            'n_bytes': os.path.getsize(path_name + shard_names[k]),
+            'sha256': compute_file_checksum(path_name + shard_names[k]),
+        } for k in range(n_shards)],
+    }
+
+    with open(path_name + manifest_file_name(file_name), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+    return manifest
+
+
+def load_manifest(file_name: str, path_name: str = '../data/') -> dict:
+    if not file_name.endswith(MANIFEST_SUFFIX):
+        file_name = manifest_file_name(file_name)
+    with open(path_name + file_name, 'r') as file:
+        return json.load(file)
+
+
+def verify_shard(shard: dict, path_name: str = '../data/') -> bool:
+    file_path = path_name + shard['file_name']
+    return os.path.exists(file_path) and \
+        os.path.getsize(file_path) == shard['n_bytes'] and \
+        compute_file_checksum(file_path) == shard['sha256']
+
+
+def shards_for_worker(manifest: dict, worker_index: int, n_workers: int) -> [dict]:
+    if not 0 <= worker_index < n_workers:
+        raise ValueError('The worker index must be between 0 and %d' % (n_workers - 1))
+    return [shard for shard in manifest['shards'] if shard['index'] % n_workers == worker_index]
+
+
+def claim_next_shard(manifest: dict, path_name: str = '../data/', worker_id: str = None):
+    # A claim is a lock file created with O_EXCL, which is atomic on local
+    # and NFS-style shared storage, so concurrent workers never share a shard
+    if worker_id is None:
+        worker_id = '%s:%d' % (os.uname().nodename, os.getpid())
+
+    for shard in manifest['shards']:
+        claim_path = path_name + shard['file_name'] + CLAIM_SUFFIX
+        try:
+            fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        with os.fdopen(fd, 'w') as claim_file:
+            claim_file.write(worker_id + '\n')
+        return shard
+
+    return None
+
+
+def iter_claimed_shards(manifest: dict, path_name: str = '../data/', worker_id: str = None):
+    while True:
+        shard = claim_next_shard(manifest, path_name, worker_id)
+        if shard is None:
+            return
+        yield shard
+
+
+def reset_claims(manifest: dict, path_name: str = '../data/'):
+    for shard in manifest['shards']:
+        claim_path = path_name + shard['file_name'] + CLAIM_SUFFIX
+        if os.path.exists(claim_path):
+            os.remove(claim_path)
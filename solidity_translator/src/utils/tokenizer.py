@@ -0,0 +1,215 @@
+import functools
+import os
+import re
+import sys
+import unicodedata
+
+from src.utils.compressed_io import open_file
+from src.utils.paths import HELPER_PATH
+
+# A Python port of the parts of the helper's tokenizer.perl (moses) that
+# the tokenization step used: `tokenizer.perl -a -no-escape -l <language>`.
+# Protected patterns, -penn and the fi/sv/fr/it/ga/so specific rules are
+# not ported.
+
+UNSUPPORTED_LANGUAGES = ['fi', 'sv', 'fr', 'it', 'ga', 'so']
+
+# Perl's \s, which unlike Python's does not contain \x1c-\x1f
+PERL_SPACE = '\t\n\x0b\x0c\r \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000'
+SPACES = re.compile('[%s]+' % PERL_SPACE)
+BLANK_LINE = re.compile('[%s]*' % PERL_SPACE)
+CONTROL_CHARS = re.compile('[\x00-\x1f]')
+MULTIPLE_SPACES = re.compile(' +')
+MULTI_DOTS = re.compile(r'\.(\.+)')
+DOTMULTI_BEFORE_OTHER = re.compile(r'DOTMULTI\.([^.])')
+WORD_ENDING_WITH_DOT = re.compile(r'^(\S+)\.$')
+DOT_QUOTE_AT_END = re.compile(r"\.' ?$")
+ESCAPES = [('&', '&amp;'), ('|', '&#124;'), ('<', '&lt;'), ('>', '&gt;'), ("'", '&apos;'), ('"', '&quot;'),
+           ('[', '&#91;'), (']', '&#93;')]
+
+
+def character_ranges(category: str) -> str:
+    ranges = []
+    for code in range(sys.maxunicode + 1):
+        if unicodedata.category(chr(code)) == category:
+            if ranges and ranges[-1][1] == code - 1:
+                ranges[-1][1] = code
+            else:
+                ranges.append([code, code])
+    return ''.join(re.escape(chr(first)) if first == last else '%s-%s' % (re.escape(chr(first)), re.escape(chr(last)))
+                   for first, last in ranges)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_patterns(ascii_only: bool = False) -> dict:
+    # Python's \w also matches the other numbers (No) such as '²', which are
+    # neither \p{IsAlnum} nor \p{IsAlpha} in perl but are \p{IsN}. Ascii
+    # text has none of them and gets the cheaper patterns without the ranges
+    other_numbers = '' if ascii_only else character_ranges('No')
+    letter_numbers = '' if ascii_only else character_ranges('Nl')
+    alpha = r'[^\W\d_%s]' % other_numbers
+    non_alpha = r'[\W\d_%s]' % other_numbers
+    alnum = r'[^\W_%s]' % other_numbers
+    number = r'[\d%s%s]' % (other_numbers, letter_numbers)
+    non_number = r'[^\d%s%s]' % (other_numbers, letter_numbers)
+    special_chars = r"([^\w%s.'`,\-]|[_%s])" % (PERL_SPACE, other_numbers) if other_numbers else \
+        r"([^\w%s.'`,\-]|_)" % PERL_SPACE
+
+    return {
+        'alpha': re.compile(alpha),
+        'special_chars': re.compile(special_chars),
+        'aggressive_hyphen': re.compile(r'(%s)\-(?=%s)' % (alnum, alnum)),
+        'comma_after_non_number': re.compile(r'(%s),' % non_number),
+        'comma_before_non_number': re.compile(r',(%s)' % non_number),
+        'comma_at_end_after_number': re.compile(r'(%s),$' % number),
+        'en_contractions': [
+            (re.compile(r"(%s)'(%s)" % (non_alpha, non_alpha)), r"\1 ' \2"),
+            (re.compile(r"([\W_])'(%s)" % alpha), r"\1 ' \2"),
+            (re.compile(r"(%s)'(%s)" % (alpha, non_alpha)), r"\1 ' \2"),
+            (re.compile(r"(%s)'(%s)" % (alpha, alpha)), r"\1 '\2"),
+            (re.compile(r"(%s)'(s)" % number), r"\1 '\2"),
+        ],
+    }
+
+
+def load_nonbreaking_prefixes(language: str, helper_path: str = HELPER_PATH) -> dict:
+    prefix_file = os.path.join(helper_path, 'nonbreaking_prefix.' + language)
+    if not os.path.exists(prefix_file):
+        prefix_file = os.path.join(helper_path, 'nonbreaking_prefix.en')
+
+    prefixes = {}
+    with open(prefix_file, 'r', encoding='utf-8') as file:
+        for item in file:
+            item = item.rstrip('\n')
+            if item and item[0] != '#':
+                match = re.match(r'(.*)[%s]+(#NUMERIC_ONLY#)' % PERL_SPACE, item)
+                if match:
+                    prefixes[match.group(1)] = 2
+                else:
+                    prefixes[item] = 1
+    return prefixes
+
+
+def is_lower_start(word: str) -> bool:
+    return word != '' and word[0].islower()
+
+
+class Tokenizer:
+    def __init__(self, language: str = 'en', aggressive: bool = True, escape: bool = False, helper_path: str = HELPER_PATH):
+        if language in UNSUPPORTED_LANGUAGES:
+            raise ValueError('The rules of tokenizer.perl for %s are not ported' % language)
+        self.language = language
+        self.aggressive = aggressive
+        self.escape = escape
+        self.nonbreaking_prefixes = load_nonbreaking_prefixes(language, helper_path)
+        self.ascii_patterns = compile_patterns(ascii_only=True)
+
+    def tokenize(self, text: str) -> str:
+        if text.endswith('\n'):
+            text = text[:-1]
+        # Blank lines are passed through untouched, as tokenizer.perl does
+        if BLANK_LINE.fullmatch(text):
+            return text
+        text = ' %s ' % text
+
+        text = SPACES.sub(' ', text)
+        text = CONTROL_CHARS.sub('', text)
+        text = MULTIPLE_SPACES.sub(' ', text)
+        if text.startswith(' '):
+            text = text[1:]
+        if text.endswith(' '):
+            text = text[:-1]
+
+        # The full unicode patterns take a scan of the unicode database to
+        # build, so they are only compiled once a non ascii line shows up
+        patterns = self.ascii_patterns if text.isascii() else compile_patterns()
+        # The substitutions below are skipped when the character they act on
+        # is missing, which leaves the result unchanged
+        text = patterns['special_chars'].sub(r' \1 ', text)
+        if self.aggressive and '-' in text:
+            text = patterns['aggressive_hyphen'].sub(r'\1 @-@ ', text)
+
+        if '..' in text:
+            text = MULTI_DOTS.sub(r' DOTMULTI\1', text)
+        while 'DOTMULTI.' in text:
+            text = DOTMULTI_BEFORE_OTHER.sub(r'DOTDOTMULTI \1', text)
+            text = text.replace('DOTMULTI.', 'DOTDOTMULTI')
+
+        if ',' in text:
+            text = patterns['comma_after_non_number'].sub(r'\1 , ', text)
+            text = patterns['comma_before_non_number'].sub(r' , \1', text)
+            text = patterns['comma_at_end_after_number'].sub(r'\1 ,', text)
+
+        if "'" not in text:
+            pass
+        elif self.language == 'en':
+            for pattern, replacement in patterns['en_contractions']:
+                text = pattern.sub(replacement, text)
+        else:
+            text = text.replace("'", " ' ")
+
+        text = self.split_sentence_final_dots(text, patterns['alpha'])
+
+        text = MULTIPLE_SPACES.sub(' ', text)
+        if text.startswith(' '):
+            text = text[1:]
+        if text.endswith(' '):
+            text = text[:-1]
+        if "'" in text:
+            text = DOT_QUOTE_AT_END.sub(" . ' ", text, count=1)
+
+        while 'DOTDOTMULTI' in text:
+            text = text.replace('DOTDOTMULTI', 'DOTMULTI.')
+        text = text.replace('DOTMULTI', '.')
+
+        if self.escape:
+            for char, escaped in ESCAPES:
+                text = text.replace(char, escaped)
+        return text
+
+    def split_sentence_final_dots(self, text: str, alpha) -> str:
+        words = text.split(' ')
+        # Perl's split drops trailing empty fields
+        while words and words[-1] == '':
+            words.pop()
+
+        for i in range(len(words)):
+            match = WORD_ENDING_WITH_DOT.match(words[i])
+            if not match:
+                continue
+            pre = match.group(1)
+            is_last = i == len(words) - 1
+            if is_last:
+                words[i] = pre + ' .'
+            elif ('.' in pre and alpha.search(pre)) or self.nonbreaking_prefixes.get(pre) == 1 or \
+                    is_lower_start(words[i + 1]):
+                pass
+            elif self.nonbreaking_prefixes.get(pre) == 2 and re.match(r'[0-9]+', words[i + 1]):
+                pass
+            else:
+                words[i] = pre + ' .'
+        return ''.join(word + ' ' for word in words)
+
+    def tokenize_lines(self, lines) -> [str]:
+        return [self.tokenize(line) for line in lines]
+
+    def tokenize_stream(self, input_stream, output_stream) -> (int, int):
+        n_lines = 0
+        n_tokens = 0
+        for line in input_stream:
+            line = self.tokenize(line)
+            output_stream.write(line + '\n')
+            n_lines += 1
+            n_tokens += len(line.split())
+        return n_lines, n_tokens
+
+
+def tokenize_file(input_path: str, output_path: str, language: str = 'en', drop_last_line: bool = False) -> (int, int):
+    tokenizer = Tokenizer(language)
+    # newline='\n' splits lines exactly where perl does, on \n only. Either file can be compressed
+    with open_file(input_path, 'r', encoding='utf-8', newline='\n') as input_file:
+        lines = input_file.readlines() if drop_last_line else input_file
+        if drop_last_line:
+            lines = lines[:-1]
+        with open_file(output_path, 'w', encoding='utf-8', newline='\n') as output_file:
+            return tokenizer.tokenize_stream(lines, output_file)
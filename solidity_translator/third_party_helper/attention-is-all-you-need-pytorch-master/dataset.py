@@ -28,6 +28,24 @@ def collate_fn(insts):
 
     return batch_seq, batch_pos
 
+def length_bucketed_batches(lengths, max_tokens):
+    ''' Group the instance indices into batches of similar lengths, each padding to at most max_tokens '''
+
+    # Sorted by length, every batch only pads to its own longest instance, and
+    # an instance longer than max_tokens still gets a batch of its own
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+    batches, batch = [], []
+    for inst_idx in order:
+        if batch and lengths[inst_idx] * (len(batch) + 1) > max_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(inst_idx)
+    if batch:
+        batches.append(batch)
+
+    return batches
+
 class TranslationDataset(torch.utils.data.Dataset):
     def __init__(
         self, src_word2idx, tgt_word2idx,
@@ -1,14 +1,24 @@
 ''' Handling the data io '''
 import argparse
+import gzip
+import lzma
 import torch
 import transformer.Constants as Constants
 
+def open_text_file(file_path, mode='r'):
+    ''' Open a plain, .gz or .xz text file as a stream '''
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, mode + 't')
+    if file_path.endswith('.xz'):
+        return lzma.open(file_path, mode + 't')
+    return open(file_path, mode)
+
 def read_instances_from_file(inst_file, max_sent_len, keep_case):
     ''' Convert file into word seq lists and vocab '''
 
     word_insts = []
     trimmed_sent_count = 0
-    with open(inst_file) as f:
+    with open_text_file(inst_file) as f:
         for sent in f:
             if not keep_case:
                 sent = sent.lower()
@@ -65,6 +75,32 @@ def convert_instance_to_idx_seq(word_insts, word2idx):
     ''' Mapping words to idx sequence. '''
     return [[word2idx.get(w, Constants.UNK) for w in s] for s in word_insts]
 
+def fit_decode_length_cap(src_insts, tgt_insts, slack=5, margin=1.25):
+    ''' Fit the most words to decode for a source as max_len_a * source length + max_len_b,
+        so that every training target fits within it with a margin for unseen ones '''
+
+    # The source counts <s> and </s> as at translation, the decoded words count </s> but not <s>
+    pairs = [(len(src_inst), len(tgt_inst) - 1) for src_inst, tgt_inst in zip(src_insts, tgt_insts)]
+    if not pairs:
+        return None, None
+
+    # The least squares line, raised until it is above every pair, then scaled by the margin
+    mean_src = sum(src_len for src_len, _ in pairs) / len(pairs)
+    mean_tgt = sum(tgt_len for _, tgt_len in pairs) / len(pairs)
+    var_src = sum((src_len - mean_src) ** 2 for src_len, _ in pairs)
+    cov = sum((src_len - mean_src) * (tgt_len - mean_tgt) for src_len, tgt_len in pairs)
+    max_len_a = max(cov / var_src, 0.0) if var_src else 0.0
+    max_len_b = max(tgt_len - max_len_a * src_len for src_len, tgt_len in pairs) + slack
+
+    return max_len_a * margin, max_len_b * margin
+
+def get_decode_length_cap(data):
+    ''' The length cap saved with the data, or fitted on its training pairs for data saved before it '''
+    settings = data['settings']
+    if getattr(settings, 'max_len_a', None) is None:
+        return fit_decode_length_cap(data['train']['src'], data['train']['tgt'])
+    return settings.max_len_a, settings.max_len_b
+
 def main():
     ''' Main function '''
 
@@ -144,6 +180,9 @@ def main():
     train_tgt_insts = convert_instance_to_idx_seq(train_tgt_word_insts, tgt_word2idx)
     valid_tgt_insts = convert_instance_to_idx_seq(valid_tgt_word_insts, tgt_word2idx)
 
+    opt.max_len_a, opt.max_len_b = fit_decode_length_cap(train_src_insts, train_tgt_insts)
+    print('[Info] Decode at most {:.2f} * source length + {:.1f} words.'.format(opt.max_len_a, opt.max_len_b))
+
     data = {
         'settings': opt,
         'dict': {
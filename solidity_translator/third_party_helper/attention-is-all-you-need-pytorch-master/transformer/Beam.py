@@ -6,98 +6,111 @@
 """
 
 import torch
-import numpy as np
 import transformer.Constants as Constants
 
-class Beam():
-    ''' Beam search '''
+class BatchBeam():
+    ''' Beam search over all the instances of a batch at once '''
 
-    def __init__(self, size, device=False):
+    def __init__(self, size, max_lens, device=False):
 
         self.size = size
-        self._done = False
+        self.len_dec_seq = 0
 
-        # The score for each translation on the beam.
-        self.scores = torch.zeros((size,), dtype=torch.float, device=device)
-        self.all_scores = []
+        # The most words each instance may decode, it is finished when it reaches them.
+        n_inst = max_lens.size(0)
+        max_len = int(max_lens.max()) if n_inst else 0
+        self.max_lens = max_lens.to(device)
+        self.n_length_capped = 0
 
-        # The backpointers at each time-step.
-        self.prev_ks = []
+        # The score for each translation on the beams of every instance.
+        self.scores = torch.zeros((n_inst, size), dtype=torch.float, device=device)
 
-        # The outputs at each time-step.
-        self.next_ys = [torch.full((size,), Constants.PAD, dtype=torch.long, device=device)]
-        self.next_ys[0][0] = Constants.BOS
+        # The outputs so far of every beam, starting with <s> on the first one.
+        self.history = torch.full((n_inst, size, max_len + 1), Constants.PAD, dtype=torch.long, device=device)
+        self.history[:, 0, 0] = Constants.BOS
 
-    def get_current_state(self):
-        "Get the outputs for the current timestep."
-        return self.get_tentative_hypothesis()
-
-    def get_current_origin(self):
-        "Get the backpointers for the current timestep."
-        return self.prev_ks[-1]
+        # Instances finish when the top of their beam is EOS, the others are still decoded.
+        self.done = torch.zeros((n_inst,), dtype=torch.uint8, device=device)
+        self.lengths = torch.zeros((n_inst,), dtype=torch.long, device=device)
+        self.active_inst_idx = torch.arange(n_inst, dtype=torch.long, device=device)
 
     @property
-    def done(self):
-        return self._done
+    def n_active(self):
+        return self.active_inst_idx.size(0)
 
-    def advance(self, word_prob):
-        "Update beam status and check if finished or not."
-        num_words = word_prob.size(1)
-
-        # Sum the previous scores.
-        if len(self.prev_ks) > 0:
-            beam_lk = word_prob + self.scores.unsqueeze(1).expand_as(word_prob)
-        else:
-            beam_lk = word_prob[0]
+    def get_current_state(self):
+        "Get the outputs of the active beams so far: (n_active * size) x (len_dec_seq + 1)."
+        dec_seq = self.history.index_select(0, self.active_inst_idx)[:, :, :self.len_dec_seq + 1]
+        return dec_seq.contiguous().view(-1, self.len_dec_seq + 1)
 
-        flat_beam_lk = beam_lk.view(-1)
+    def get_current_word(self):
+        "Get the last output of the active beams: (n_active * size) x 1."
+        dec_word = self.history.index_select(0, self.active_inst_idx)[:, :, self.len_dec_seq]
+        return dec_word.contiguous().view(-1, 1)
 
-        best_scores, best_scores_id = flat_beam_lk.topk(self.size, 0, True, True) # 1st sort
-        best_scores, best_scores_id = flat_beam_lk.topk(self.size, 0, True, True) # 2nd sort
+    def advance(self, word_prob):
+        """ Update the beams of the active instances with word_prob (n_active x size x words).
+            Return the rows of the current state which the beams of the still active instances extend. """
+        n_active, _, num_words = word_prob.size()
+        active_inst_idx = self.active_inst_idx
+
+        # Sum the previous scores. All beams start out the same, so only the first one is expanded.
+        if self.len_dec_seq > 0:
+            beam_lk = word_prob + self.scores.index_select(0, active_inst_idx).unsqueeze(2)
+        else:
+            beam_lk = word_prob[:, :1, :]
 
-        self.all_scores.append(self.scores)
-        self.scores = best_scores
+        flat_beam_lk = beam_lk.contiguous().view(n_active, -1)
+        best_scores, best_scores_id = flat_beam_lk.topk(self.size, 1, True, True)
 
         # bestScoresId is flattened as a (beam x word) array,
         # so we need to calculate which word and beam each score came from
-        prev_k = best_scores_id / num_words
-        self.prev_ks.append(prev_k)
-        self.next_ys.append(best_scores_id - prev_k * num_words)
-
-        # End condition is when top-of-beam is EOS.
-        if self.next_ys[-1][0].item() == Constants.EOS:
-            self._done = True
-            self.all_scores.append(self.scores)
-
-        return self._done
+        prev_k = best_scores_id // num_words
+        next_y = best_scores_id - prev_k * num_words
+
+        # Reorder the outputs of every beam after the beam it extends, and append the new words.
+        self.len_dec_seq += 1
+        len_dec_seq = self.len_dec_seq
+        history = self.history.index_select(0, active_inst_idx)
+        history[:, :, :len_dec_seq] = history[:, :, :len_dec_seq].gather(
+            1, prev_k.unsqueeze(2).expand(-1, -1, len_dec_seq))
+        history[:, :, len_dec_seq] = next_y
+        self.history.index_copy_(0, active_inst_idx, history)
+        self.scores.index_copy_(0, active_inst_idx, best_scores)
+        self.lengths.index_fill_(0, active_inst_idx, len_dec_seq)
+
+        # End condition is when top-of-beam is EOS, or the instance reached its length cap.
+        inst_eos = next_y[:, 0].eq(Constants.EOS)
+        inst_capped = self.max_lens.index_select(0, active_inst_idx).le(len_dec_seq) & inst_eos.eq(0)
+        self.n_length_capped += int(inst_capped.sum())
+        inst_done = inst_eos | inst_capped
+        self.done.index_fill_(0, active_inst_idx.masked_select(inst_done), 1)
+
+        inst_active = inst_done.eq(0)
+        self.active_inst_idx = active_inst_idx.masked_select(inst_active)
+        beam_origin = prev_k + torch.arange(0, n_active * self.size, self.size, device=prev_k.device).unsqueeze(1)
+        return beam_origin[inst_active].view(-1)
+
+    def finish_active(self):
+        "Finish the active instances with the hypotheses they have so far, return how many."
+        n_active = self.n_active
+        self.done.index_fill_(0, self.active_inst_idx, 1)
+        self.active_inst_idx = self.active_inst_idx[:0]
+        return n_active
 
     def sort_scores(self):
-        "Sort the scores."
-        return torch.sort(self.scores, 0, True)
-
-    def get_the_best_score_and_idx(self):
-        "Get the score of the best in the beam."
-        scores, ids = self.sort_scores()
-        return scores[1], ids[1]
-
-    def get_tentative_hypothesis(self):
-        "Get the decoded sequence for the current timestep."
-
-        if len(self.next_ys) == 1:
-            dec_seq = self.next_ys[0].unsqueeze(1)
-        else:
-            _, keys = self.sort_scores()
-            hyps = [self.get_hypothesis(k) for k in keys]
-            hyps = [[Constants.BOS] + h for h in hyps]
-            dec_seq = torch.LongTensor(hyps)
-
-        return dec_seq
-
-    def get_hypothesis(self, k):
-        """ Walk back to construct the full hypothesis. """
-        hyp = []
-        for j in range(len(self.prev_ks) - 1, -1, -1):
-            hyp.append(self.next_ys[j+1][k])
-            k = self.prev_ks[j][k]
-
-        return list(map(lambda x: x.item(), hyp[::-1]))
+        "Sort the scores of every instance."
+        return torch.sort(self.scores, 1, True)
+
+    def get_hypotheses(self, n_best):
+        """ Get the n_best hypotheses and their scores for every instance, best first. """
+        scores, tail_idxs = self.sort_scores()
+        max_length = int(self.lengths.max()) if self.lengths.numel() else 0
+        history = self.history[:, :, 1:max_length + 1].tolist()
+        lengths = self.lengths.tolist()
+
+        all_hyp, all_scores = [], []
+        for inst_idx, (inst_history, length) in enumerate(zip(history, lengths)):
+            all_scores += [scores[inst_idx, :n_best]]
+            all_hyp += [[inst_history[k][:length] for k in tail_idxs[inst_idx, :n_best].tolist()]]
+        return all_hyp, all_scores
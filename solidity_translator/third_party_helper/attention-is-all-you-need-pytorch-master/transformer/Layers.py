@@ -1,4 +1,5 @@
 ''' Define the Layers '''
+import torch
 import torch.nn as nn
 from transformer.SubLayers import MultiHeadAttention, PositionwiseFeedForward
 
@@ -47,3 +48,25 @@ class DecoderLayer(nn.Module):
         dec_output *= non_pad_mask
 
         return dec_output, dec_slf_attn, dec_enc_attn
+
+    def forward_step(self, dec_input, layer_cache, non_pad_mask=None, slf_attn_mask=None, dec_enc_attn_mask=None):
+        ''' Run only the newest position, the keys and values of the earlier ones come from layer_cache '''
+
+        slf_k, slf_v = self.slf_attn.project_keys_values(dec_input, dec_input)
+        if 'slf_k' in layer_cache:
+            slf_k = torch.cat([layer_cache['slf_k'], slf_k], dim=2)
+            slf_v = torch.cat([layer_cache['slf_v'], slf_v], dim=2)
+        layer_cache['slf_k'], layer_cache['slf_v'] = slf_k, slf_v
+
+        dec_output, dec_slf_attn = self.slf_attn.attend(
+            dec_input, slf_k, slf_v, mask=slf_attn_mask)
+        dec_output *= non_pad_mask
+
+        dec_output, dec_enc_attn = self.enc_attn.attend(
+            dec_output, layer_cache['enc_k'], layer_cache['enc_v'], mask=dec_enc_attn_mask)
+        dec_output *= non_pad_mask
+
+        dec_output = self.pos_ffn(dec_output)
+        dec_output *= non_pad_mask
+
+        return dec_output, dec_slf_attn, dec_enc_attn
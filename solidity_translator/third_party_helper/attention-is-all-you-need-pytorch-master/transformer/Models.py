@@ -152,6 +152,71 @@ class Decoder(nn.Module):
             return dec_output, dec_slf_attn_list, dec_enc_attn_list
         return dec_output,
 
+    def init_state(self, src_seq, enc_output):
+        ''' Project the encoder output once for every layer, before incremental decoding '''
+
+        layer_caches = []
+        for dec_layer in self.layer_stack:
+            enc_k, enc_v = dec_layer.enc_attn.project_keys_values(enc_output, enc_output)
+            layer_caches += [{'enc_k': enc_k, 'enc_v': enc_v}]
+
+        return DecoderState(src_seq, layer_caches)
+
+    def forward_step(self, tgt_word, tgt_pos, state, return_attns=False):
+        ''' Decode the newest word of each sequence (b x 1), same as the last position of forward '''
+
+        dec_slf_attn_list, dec_enc_attn_list = [], []
+
+        state.append(tgt_word)
+
+        # -- Prepare masks
+        # The newest word may attend to every earlier one, so only padding is masked
+        non_pad_mask = get_non_pad_mask(tgt_word)
+        slf_attn_mask = get_attn_key_pad_mask(seq_k=state.tgt_seq, seq_q=tgt_word)
+        dec_enc_attn_mask = get_attn_key_pad_mask(seq_k=state.src_seq, seq_q=tgt_word)
+
+        # -- Forward
+        dec_output = self.tgt_word_emb(tgt_word) + self.position_enc(tgt_pos)
+
+        for dec_layer, layer_cache in zip(self.layer_stack, state.layer_caches):
+            dec_output, dec_slf_attn, dec_enc_attn = dec_layer.forward_step(
+                dec_output, layer_cache,
+                non_pad_mask=non_pad_mask,
+                slf_attn_mask=slf_attn_mask,
+                dec_enc_attn_mask=dec_enc_attn_mask)
+
+            if return_attns:
+                dec_slf_attn_list += [dec_slf_attn]
+                dec_enc_attn_list += [dec_enc_attn]
+
+        if return_attns:
+            return dec_output, dec_slf_attn_list, dec_enc_attn_list
+        return dec_output,
+
+class DecoderState(object):
+    ''' Keys and values cached by every decoder layer during incremental decoding '''
+
+    def __init__(self, src_seq, layer_caches):
+        self.src_seq = src_seq
+        self.tgt_seq = None
+        self.layer_caches = layer_caches
+
+    def append(self, tgt_word):
+        ''' Remember the decoded words, for masking padding in self attention. '''
+        if self.tgt_seq is None:
+            self.tgt_seq = tgt_word
+        else:
+            self.tgt_seq = torch.cat([self.tgt_seq, tgt_word], dim=1)
+
+    def index_select(self, index):
+        ''' Keep the sequences at index, in that order, e.g. to follow beams and drop finished ones. '''
+        self.src_seq = self.src_seq.index_select(0, index)
+        if self.tgt_seq is not None:
+            self.tgt_seq = self.tgt_seq.index_select(0, index)
+        for layer_cache in self.layer_caches:
+            for name, tensor in layer_cache.items():
+                layer_cache[name] = tensor.index_select(1, index) # n x b x l x d
+
 class Transformer(nn.Module):
     ''' A sequence to sequence model with attention mechanism. '''
 
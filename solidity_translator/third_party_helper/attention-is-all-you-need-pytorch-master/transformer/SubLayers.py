@@ -34,21 +34,40 @@ class MultiHeadAttention(nn.Module):
 
     def forward(self, q, k, v, mask=None):
 
+        k, v = self.project_keys_values(k, v)
+        return self.attend(q, k, v, mask=mask)
+
+    def project_keys_values(self, k, v):
+        ''' Project the keys and values of every head: n x b x lk x dk, n x b x lv x dv '''
+
         d_k, d_v, n_head = self.d_k, self.d_v, self.n_head
 
-        sz_b, len_q, _ = q.size()
         sz_b, len_k, _ = k.size()
         sz_b, len_v, _ = v.size()
 
-        residual = q
-
-        q = self.w_qs(q).view(sz_b, len_q, n_head, d_k)
         k = self.w_ks(k).view(sz_b, len_k, n_head, d_k)
         v = self.w_vs(v).view(sz_b, len_v, n_head, d_v)
 
+        k = k.permute(2, 0, 1, 3).contiguous() # n x b x lk x dk
+        v = v.permute(2, 0, 1, 3).contiguous() # n x b x lv x dv
+
+        return k, v
+
+    def attend(self, q, k, v, mask=None):
+        ''' Attend from the queries q to keys and values already projected by project_keys_values '''
+
+        d_k, d_v, n_head = self.d_k, self.d_v, self.n_head
+
+        sz_b, len_q, _ = q.size()
+        len_k = k.size(2)
+        len_v = v.size(2)
+
+        residual = q
+
+        q = self.w_qs(q).view(sz_b, len_q, n_head, d_k)
         q = q.permute(2, 0, 1, 3).contiguous().view(-1, len_q, d_k) # (n*b) x lq x dk
-        k = k.permute(2, 0, 1, 3).contiguous().view(-1, len_k, d_k) # (n*b) x lk x dk
-        v = v.permute(2, 0, 1, 3).contiguous().view(-1, len_v, d_v) # (n*b) x lv x dv
+        k = k.view(-1, len_k, d_k) # (n*b) x lk x dk
+        v = v.view(-1, len_v, d_v) # (n*b) x lv x dv
 
         mask = mask.repeat(n_head, 1, 1) # (n*b) x .. x ..
         output, attn = self.attention(q, k, v, mask=mask)
@@ -1,11 +1,13 @@
 ''' This module will handle the text generation with beam search. '''
 
+import time
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
+import transformer.Constants as Constants
 from transformer.Models import Transformer
-from transformer.Beam import Beam
+from transformer.Beam import BatchBeam
 
 class Translator(object):
     ''' Load with trained model and handle the beam search '''
@@ -44,98 +46,87 @@ class Translator(object):
         self.model = model
         self.model.eval()
 
-    def translate_batch(self, src_seq, src_pos):
-        ''' Translation work in one batch '''
+        # Decode one word per step on top of cached keys and values, unless asked
+        # to rerun the decoder on the whole prefix like before
+        self.use_kv_cache = not getattr(opt, 'no_kv_cache', False)
 
-        def get_inst_idx_to_tensor_position_map(inst_idx_list):
-            ''' Indicate the position of an instance in a tensor. '''
-            return {inst_idx: tensor_position for tensor_position, inst_idx in enumerate(inst_idx_list)}
+        # 'greedy' keeps only the most probable word at every step, for lower latency than a beam
+        self.decode_mode = getattr(opt, 'decode_mode', 'beam')
+        if self.decode_mode == 'greedy' and (opt.n_best > 1 or not self.use_kv_cache):
+            raise ValueError('Greedy decoding keeps one hypothesis on the key/value cache, '
+                             'it supports neither n_best > 1 nor no_kv_cache')
 
-        def collect_active_part(beamed_tensor, curr_active_inst_idx, n_prev_active_inst, n_bm):
-            ''' Collect tensor parts associated to active instances. '''
+        # Each instance decodes at most max_len_a * source length + max_len_b words, and a
+        # batch still decoding after time_budget seconds is finished with what it has so far.
+        # last_timed_out flags the instances of the last batch cut off that way
+        self.max_len_a = getattr(opt, 'max_len_a', None)
+        self.max_len_b = getattr(opt, 'max_len_b', None)
+        self.time_budget = getattr(opt, 'time_budget', None)
+        self.n_length_capped = 0
+        self.n_timed_out = 0
+        self.last_timed_out = []
 
-            _, *d_hs = beamed_tensor.size()
-            n_curr_active_inst = len(curr_active_inst_idx)
-            new_shape = (n_curr_active_inst * n_bm, *d_hs)
+    def get_max_dec_lens(self, src_seq):
+        ''' The most words to decode for each source, never more than the model's longest sequence '''
 
-            beamed_tensor = beamed_tensor.view(n_prev_active_inst, -1)
-            beamed_tensor = beamed_tensor.index_select(0, curr_active_inst_idx)
-            beamed_tensor = beamed_tensor.view(*new_shape)
+        max_len = self.model_opt.max_token_seq_len
+        if self.max_len_a is None or self.max_len_b is None:
+            return torch.full((src_seq.size(0),), max_len, dtype=torch.long, device=src_seq.device)
 
-            return beamed_tensor
+        src_len = src_seq.ne(Constants.PAD).sum(1).float()
+        max_dec_lens = (src_len * self.max_len_a + self.max_len_b).ceil().long()
+        return max_dec_lens.clamp(1, max_len)
 
-        def collate_active_info(
-                src_seq, src_enc, inst_idx_to_position_map, active_inst_idx_list):
-            # Sentences which are still active are collected,
-            # so the decoder will not run on completed sentences.
-            n_prev_active_inst = len(inst_idx_to_position_map)
-            active_inst_idx = [inst_idx_to_position_map[k] for k in active_inst_idx_list]
-            active_inst_idx = torch.LongTensor(active_inst_idx).to(self.device)
+    def get_deadline(self):
+        if not self.time_budget:
+            return None
+        return time.perf_counter() + self.time_budget
 
-            active_src_seq = collect_active_part(src_seq, active_inst_idx, n_prev_active_inst, n_bm)
-            active_src_enc = collect_active_part(src_enc, active_inst_idx, n_prev_active_inst, n_bm)
-            active_inst_idx_to_position_map = get_inst_idx_to_tensor_position_map(active_inst_idx_list)
+    def translate_batch(self, src_seq, src_pos, deadline=None):
+        ''' Translation work in one batch, finished at deadline or else time_budget seconds from now '''
 
-            return active_src_seq, active_src_enc, active_inst_idx_to_position_map
+        if self.decode_mode == 'greedy':
+            return self.translate_batch_greedy(src_seq, src_pos, deadline)
 
-        def beam_decode_step(
-                inst_dec_beams, len_dec_seq, src_seq, enc_output, inst_idx_to_position_map, n_bm):
-            ''' Decode and update beam status, and then return active beam idx '''
+        def predict_word(dec_seq, dec_pos, src_seq, enc_output, n_active_inst, n_bm):
+            dec_output, *_ = self.model.decoder(dec_seq, dec_pos, src_seq, enc_output)
+            dec_output = dec_output[:, -1, :]  # Pick the last step: (bh * bm) * d_h
+            word_prob = F.log_softmax(self.model.tgt_word_prj(dec_output), dim=1)
+            word_prob = word_prob.view(n_active_inst, n_bm, -1)
 
-            def prepare_beam_dec_seq(inst_dec_beams, len_dec_seq):
-                dec_partial_seq = [b.get_current_state() for b in inst_dec_beams if not b.done]
-                dec_partial_seq = torch.stack(dec_partial_seq).to(self.device)
-                dec_partial_seq = dec_partial_seq.view(-1, len_dec_seq)
-                return dec_partial_seq
+            return word_prob
 
-            def prepare_beam_dec_pos(len_dec_seq, n_active_inst, n_bm):
-                dec_partial_pos = torch.arange(1, len_dec_seq + 1, dtype=torch.long, device=self.device)
-                dec_partial_pos = dec_partial_pos.unsqueeze(0).repeat(n_active_inst * n_bm, 1)
-                return dec_partial_pos
+        def predict_next_word(dec_word, len_dec_seq, dec_state, n_active_inst, n_bm):
+            dec_pos = torch.full_like(dec_word, len_dec_seq)
+            dec_output, *_ = self.model.decoder.forward_step(dec_word, dec_pos, dec_state)
+            word_prob = F.log_softmax(self.model.tgt_word_prj(dec_output[:, -1, :]), dim=1)
+            word_prob = word_prob.view(n_active_inst, n_bm, -1)
 
-            def predict_word(dec_seq, dec_pos, src_seq, enc_output, n_active_inst, n_bm):
-                dec_output, *_ = self.model.decoder(dec_seq, dec_pos, src_seq, enc_output)
-                dec_output = dec_output[:, -1, :]  # Pick the last step: (bh * bm) * d_h
-                word_prob = F.log_softmax(self.model.tgt_word_prj(dec_output), dim=1)
-                word_prob = word_prob.view(n_active_inst, n_bm, -1)
+            return word_prob
 
-                return word_prob
+        def beam_decode_step(beams, len_dec_seq, src_seq, enc_output, n_bm, dec_state=None):
+            ''' Decode and update beam status, and then return the rows the active beams extend '''
 
-            def collect_active_inst_idx_list(inst_beams, word_prob, inst_idx_to_position_map):
-                active_inst_idx_list = []
-                for inst_idx, inst_position in inst_idx_to_position_map.items():
-                    is_inst_complete = inst_beams[inst_idx].advance(word_prob[inst_position])
-                    if not is_inst_complete:
-                        active_inst_idx_list += [inst_idx]
+            n_active_inst = beams.n_active
 
-                return active_inst_idx_list
+            if dec_state is None:
+                dec_seq = beams.get_current_state()
+                dec_pos = torch.arange(1, len_dec_seq + 1, dtype=torch.long, device=self.device)
+                dec_pos = dec_pos.unsqueeze(0).repeat(n_active_inst * n_bm, 1)
+                word_prob = predict_word(dec_seq, dec_pos, src_seq, enc_output, n_active_inst, n_bm)
+            else:
+                word_prob = predict_next_word(beams.get_current_word(), len_dec_seq, dec_state, n_active_inst, n_bm)
 
-            n_active_inst = len(inst_idx_to_position_map)
+            return beams.advance(word_prob)
 
-            dec_seq = prepare_beam_dec_seq(inst_dec_beams, len_dec_seq)
-            dec_pos = prepare_beam_dec_pos(len_dec_seq, n_active_inst, n_bm)
-            word_prob = predict_word(dec_seq, dec_pos, src_seq, enc_output, n_active_inst, n_bm)
-
-            # Update the beam with predicted word prob information and collect incomplete instances
-            active_inst_idx_list = collect_active_inst_idx_list(
-                inst_dec_beams, word_prob, inst_idx_to_position_map)
-
-            return active_inst_idx_list
-
-        def collect_hypothesis_and_scores(inst_dec_beams, n_best):
-            all_hyp, all_scores = [], []
-            for inst_idx in range(len(inst_dec_beams)):
-                scores, tail_idxs = inst_dec_beams[inst_idx].sort_scores()
-                all_scores += [scores[:n_best]]
-
-                hyps = [inst_dec_beams[inst_idx].get_hypothesis(i) for i in tail_idxs[:n_best]]
-                all_hyp += [hyps]
-            return all_hyp, all_scores
+        if deadline is None:
+            deadline = self.get_deadline()
 
         with torch.no_grad():
             #-- Encode
             src_seq, src_pos = src_seq.to(self.device), src_pos.to(self.device)
             src_enc, *_ = self.model.encoder(src_seq, src_pos)
+            max_dec_lens = self.get_max_dec_lens(src_seq)
 
             #-- Repeat data for beam search
             n_bm = self.opt.beam_size
@@ -143,25 +134,96 @@ class Translator(object):
             src_seq = src_seq.repeat(1, n_bm).view(n_inst * n_bm, len_s)
             src_enc = src_enc.repeat(1, n_bm, 1).view(n_inst * n_bm, len_s, d_h)
 
-            #-- Prepare beams
-            inst_dec_beams = [Beam(n_bm, device=self.device) for _ in range(n_inst)]
+            #-- Prepare beams, the scores and outputs of all instances are kept in the same tensors
+            beams = BatchBeam(n_bm, max_dec_lens, device=self.device)
+            max_len = int(max_dec_lens.max())
+            self.last_timed_out = [False] * n_inst
 
-            #-- Bookkeeping for active or not
-            active_inst_idx_list = list(range(n_inst))
-            inst_idx_to_position_map = get_inst_idx_to_tensor_position_map(active_inst_idx_list)
+            #-- Cache the projected encoder output, and later the decoder keys and values
+            dec_state = self.model.decoder.init_state(src_seq, src_enc) if self.use_kv_cache else None
 
             #-- Decode
-            for len_dec_seq in range(1, self.model_opt.max_token_seq_len + 1):
+            for len_dec_seq in range(1, max_len + 1):
+
+                beam_origin = beam_decode_step(beams, len_dec_seq, src_seq, src_enc, n_bm, dec_state)
+
+                if not beams.n_active:
+                    break  # all instances have finished their path to <EOS> or their length cap
+
+                if deadline is not None and time.perf_counter() > deadline:
+                    for inst_idx in beams.active_inst_idx.tolist():
+                        self.last_timed_out[inst_idx] = True
+                    self.n_timed_out += beams.finish_active()
+                    break
+
+                # Follow each beam back to the row it extends, dropping finished instances,
+                # so the decoder will not run on completed sentences
+                if dec_state is None:
+                    src_seq = src_seq.index_select(0, beam_origin)
+                    src_enc = src_enc.index_select(0, beam_origin)
+                else:
+                    dec_state.index_select(beam_origin)
 
-                active_inst_idx_list = beam_decode_step(
-                    inst_dec_beams, len_dec_seq, src_seq, src_enc, inst_idx_to_position_map, n_bm)
+        self.n_length_capped += beams.n_length_capped
+        batch_hyp, batch_scores = beams.get_hypotheses(self.opt.n_best)
 
-                if not active_inst_idx_list:
-                    break  # all instances have finished their path to <EOS>
+        return batch_hyp, batch_scores
+
+    def translate_batch_greedy(self, src_seq, src_pos, deadline=None):
+        ''' Translation work in one batch, picking the most probable word at every step '''
 
-                src_seq, src_enc, inst_idx_to_position_map = collate_active_info(
-                    src_seq, src_enc, inst_idx_to_position_map, active_inst_idx_list)
+        if deadline is None:
+            deadline = self.get_deadline()
+
+        with torch.no_grad():
+            #-- Encode
+            src_seq, src_pos = src_seq.to(self.device), src_pos.to(self.device)
+            src_enc, *_ = self.model.encoder(src_seq, src_pos)
+            dec_state = self.model.decoder.init_state(src_seq, src_enc)
+            max_dec_lens = self.get_max_dec_lens(src_seq)
+
+            n_inst = src_seq.size(0)
+            max_len = int(max_dec_lens.max())
+            dec_seq = torch.full((n_inst, max_len + 1), Constants.PAD, dtype=torch.long, device=self.device)
+            dec_seq[:, 0] = Constants.BOS
+            scores = torch.zeros((n_inst,), dtype=torch.float, device=self.device)
+            lengths = torch.zeros((n_inst,), dtype=torch.long, device=self.device)
+            active_inst_idx = torch.arange(n_inst, dtype=torch.long, device=self.device)
+            self.last_timed_out = [False] * n_inst
 
-        batch_hyp, batch_scores = collect_hypothesis_and_scores(inst_dec_beams, self.opt.n_best)
+            #-- Decode
+            dec_word = dec_seq[:, :1]
+            for len_dec_seq in range(1, max_len + 1):
+                dec_pos = torch.full_like(dec_word, len_dec_seq)
+                dec_output, *_ = self.model.decoder.forward_step(dec_word, dec_pos, dec_state)
+                word_prob = F.log_softmax(self.model.tgt_word_prj(dec_output[:, -1, :]), dim=1)
+                best_score, best_word = word_prob.max(1)
+
+                dec_seq[:, len_dec_seq].index_copy_(0, active_inst_idx, best_word)
+                scores.index_add_(0, active_inst_idx, best_score)
+                lengths.index_fill_(0, active_inst_idx, len_dec_seq)
+
+                # Instances which produced EOS or reached their length cap are dropped,
+                # so the decoder will not run on them
+                inst_eos = best_word.eq(Constants.EOS)
+                inst_capped = max_dec_lens.index_select(0, active_inst_idx).le(len_dec_seq) & inst_eos.eq(0)
+                self.n_length_capped += int(inst_capped.sum())
+                inst_active = (inst_eos | inst_capped).eq(0)
+                active_inst_idx = active_inst_idx.masked_select(inst_active)
+                if not active_inst_idx.size(0):
+                    break  # all instances have finished their path to <EOS> or their length cap
+
+                if deadline is not None and time.perf_counter() > deadline:
+                    for inst_idx in active_inst_idx.tolist():
+                        self.last_timed_out[inst_idx] = True
+                    self.n_timed_out += active_inst_idx.size(0)
+                    break
+
+                dec_state.index_select(inst_active.nonzero().view(-1))
+                dec_word = best_word.masked_select(inst_active).view(-1, 1)
+
+        dec_seq = dec_seq[:, 1:].tolist()
+        batch_hyp = [[hyp[:length]] for hyp, length in zip(dec_seq, lengths.tolist())]
+        batch_scores = [score.view(1) for score in scores]
 
         return batch_hyp, batch_scores
@@ -1,13 +1,15 @@
 ''' Translate input text with trained model. '''
 
+import json
+import time
 import torch
 import torch.utils.data
 import argparse
 from tqdm import tqdm
 
-from dataset import collate_fn, TranslationDataset
+from dataset import collate_fn, length_bucketed_batches, TranslationDataset
 from transformer.Translator import Translator
-from preprocess import read_instances_from_file, convert_instance_to_idx_seq
+from preprocess import read_instances_from_file, convert_instance_to_idx_seq, get_decode_length_cap, open_text_file
 
 def main():
     '''Main Function'''
@@ -26,14 +28,38 @@ def main():
     parser.add_argument('-beam_size', type=int, default=5,
                         help='Beam size')
     parser.add_argument('-batch_size', type=int, default=30,
-                        help='Batch size')
+                        help='Batch size, when -max_tokens is 0')
+    parser.add_argument('-max_tokens', type=int, default=3000,
+                        help="""Batch sources of similar lengths together, as many as fit
+                        this many padded source tokens. 0 batches -batch_size sources in file order""")
     parser.add_argument('-n_best', type=int, default=1,
                         help="""If verbose is set, will output the n_best
                         decoded sentences""")
+    parser.add_argument('-decode_mode', choices=['beam', 'greedy'], default='beam',
+                        help="""greedy keeps only the most probable word at every step, ignoring -beam_size.
+                        It needs -n_best 1 and the key/value cache""")
+    parser.add_argument('-max_len_a', type=float, default=None,
+                        help="""Decode at most max_len_a * source length + max_len_b words per source.
+                        Both default to the values fitted on the training pairs of -vocab""")
+    parser.add_argument('-max_len_b', type=float, default=None)
+    parser.add_argument('-time_budget', type=float, default=0,
+                        help='Seconds after which each batch is finished with the hypotheses it has, 0 for none')
     parser.add_argument('-no_cuda', action='store_true')
+    parser.add_argument('-no_kv_cache', action='store_true',
+                        help="""Rerun the decoder on the whole prefix at every step instead of caching keys and values.
+                        Beam search only""")
+    parser.add_argument('-report', default=None,
+                        help='Path to write the time spent in each stage and batch as json')
 
     opt = parser.parse_args()
     opt.cuda = not opt.no_cuda
+    if opt.decode_mode == 'greedy' and opt.n_best > 1:
+        parser.error('-decode_mode greedy produces a single hypothesis, -n_best must be 1')
+    if opt.decode_mode == 'greedy' and opt.no_kv_cache:
+        parser.error('-decode_mode greedy always decodes on the key/value cache, -no_kv_cache is not supported')
+
+    report = {'stages': {}, 'batches': []}
+    start = time.perf_counter()
 
     # Prepare DataLoader
     preprocess_data = torch.load(opt.vocab)
@@ -45,25 +71,78 @@ def main():
     test_src_insts = convert_instance_to_idx_seq(
         test_src_word_insts, preprocess_data['dict']['src'])
 
+    if opt.max_len_a is None or opt.max_len_b is None:
+        max_len_a, max_len_b = get_decode_length_cap(preprocess_data)
+        opt.max_len_a = max_len_a if opt.max_len_a is None else opt.max_len_a
+        opt.max_len_b = max_len_b if opt.max_len_b is None else opt.max_len_b
+
+    # The predictions are written back in file order whichever way the sources are batched
+    if opt.max_tokens > 0:
+        batches = length_bucketed_batches([len(inst) for inst in test_src_insts], opt.max_tokens)
+    else:
+        batches = [list(range(i, min(i + opt.batch_size, len(test_src_insts))))
+                   for i in range(0, len(test_src_insts), opt.batch_size)]
+
     test_loader = torch.utils.data.DataLoader(
         TranslationDataset(
             src_word2idx=preprocess_data['dict']['src'],
             tgt_word2idx=preprocess_data['dict']['tgt'],
             src_insts=test_src_insts),
         num_workers=2,
-        batch_size=opt.batch_size,
+        batch_sampler=batches,
         collate_fn=collate_fn)
 
+    report['stages']['read'] = time.perf_counter() - start
+
+    start = time.perf_counter()
     translator = Translator(opt)
+    report['stages']['load'] = time.perf_counter() - start
+
+    pred_lines = [None] * len(test_src_insts)
+    batch_start = time.perf_counter()
+    for inst_idxs, batch in zip(batches, tqdm(test_loader, mininterval=2, desc='  - (Test)', leave=False)):
+        decode_start = time.perf_counter()
+        all_hyp, all_scores = translator.translate_batch(*batch)
+        decode_end = time.perf_counter()
+        for inst_idx, idx_seqs in zip(inst_idxs, all_hyp):
+            pred_lines[inst_idx] = [' '.join([test_loader.dataset.tgt_idx2word[idx] for idx in idx_seq])
+                                    for idx_seq in idx_seqs]
+        batch_end = time.perf_counter()
+        report['batches'].append({
+            'n_items': len(all_hyp),
+            'n_src_tokens': int(batch[0].ne(0).sum()),
+            'n_padded_src_tokens': batch[0].numel(),
+            'n_tgt_tokens': sum(len(idx_seqs[0]) for idx_seqs in all_hyp),
+            'load_seconds': decode_start - batch_start,
+            'decode_seconds': decode_end - decode_start,
+            'write_seconds': batch_end - decode_end})
+        batch_start = batch_end
 
-    with open(opt.output, 'w') as f:
-        for batch in tqdm(test_loader, mininterval=2, desc='  - (Test)', leave=False):
-            all_hyp, all_scores = translator.translate_batch(*batch)
-            for idx_seqs in all_hyp:
-                for idx_seq in idx_seqs:
-                    pred_line = ' '.join([test_loader.dataset.tgt_idx2word[idx] for idx in idx_seq])
-                    f.write(pred_line + '\n')
+    start = time.perf_counter()
+    with open_text_file(opt.output, 'w') as f:
+        for inst_pred_lines in pred_lines:
+            for pred_line in inst_pred_lines:
+                f.write(pred_line + '\n')
+    report['stages']['write'] = time.perf_counter() - start
     print('[Info] Finished.')
 
+    if opt.report:
+        for stage in ['load', 'decode', 'write']:
+            report['stages']['batch_' + stage] = sum(batch[stage + '_seconds'] for batch in report['batches'])
+        report['n_items'] = sum(batch['n_items'] for batch in report['batches'])
+        report['n_tgt_tokens'] = sum(batch['n_tgt_tokens'] for batch in report['batches'])
+        report['n_padded_src_tokens'] = sum(batch['n_padded_src_tokens'] for batch in report['batches'])
+        report['n_length_capped'] = translator.n_length_capped
+        report['n_timed_out'] = translator.n_timed_out
+        try:
+            import resource
+            report['peak_memory_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            pass
+        if opt.cuda:
+            report['peak_cuda_memory_bytes'] = torch.cuda.max_memory_allocated()
+        with open(opt.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,35 @@
+import glob
+import sys
+
+from src.utils.compressed_io import COMPRESSED_OPENERS, get_compression_suffix
+from src.utils.instrumentation import finish_report, pop_report_option
+from src.utils.tokenizer import tokenize_file
+
+MULTI30K_PATH = 'third_party_helper/attention-is-all-you-need-pytorch-master/data/multi30k/'
+
+
+def tokenized_file_path(file_path: str) -> str:
+    # train.en becomes train.en.atok, and train.en.gz train.en.atok.gz
+    suffix = get_compression_suffix(file_path) or ''
+    return file_path[:len(file_path) - len(suffix)] + '.atok' + suffix
+
+
+def main():
+    instrumentation, report_path, print_summary = pop_report_option(sys.argv)
+    data_path = sys.argv[1] if len(sys.argv) > 1 else MULTI30K_PATH
+
+    for language in ['en', 'de']:
+        file_paths = [file_path for suffix in [''] + list(COMPRESSED_OPENERS)
+                      for file_path in glob.glob(data_path + '*.' + language + suffix)]
+        for i, file_path in enumerate(sorted(file_paths)):
+            with instrumentation.stage('tokenize_' + language, batch_index=i) as counts:
+                # The last line of the training and validation files is dropped, as the
+                # `sed -i "$ d"` of the former shell script did, without rewriting the source
+                counts['n_items'], counts['n_tokens'] = tokenize_file(file_path, tokenized_file_path(file_path),
+                                                                      language, drop_last_line='test' not in file_path)
+
+    finish_report(instrumentation, report_path, print_summary)
+
+
+if __name__ == '__main__':
+    main()
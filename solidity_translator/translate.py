@@ -1,62 +1,106 @@
 import sys
-import os
 
 from src.utils.sample_loader_saver import *
+from src.utils.background_writer import write_items_to_file_in_background
+from src.utils.instrumentation import Instrumentation, finish_report, pop_report_option
+from src.utils.options import pop_option
 
 
-def translate_by_rule(source_file_name, target_file_name):
-    print('Loading texts...')
-    contract_texts = load_sample_texts(source_file_name, './data/')
+def translate_by_rule(source_file_name, target_file_name, instrumentation: Instrumentation):
+    from src.language_rules.templates import DefineContract
 
-    print('Translating...')
-    contract_parsed = []
-    for contract_text in contract_texts:
-        contract_parsed.append(
-            beautify_contract_codes(DefineContract.parse_template_from_text(contract_text).convert_to_solidity()))
+    def parse_contracts(contract_texts):
+        for contract_text in contract_texts:
+            with instrumentation.stage('rule', 1):
+                contract_code = beautify_contract_codes(
+                    DefineContract.parse_template_from_text(contract_text).convert_to_solidity())
+            yield contract_code
 
-    write_items_to_file(contract_parsed, target_file_name, path_name='./data/')
+    print('Loading and translating texts...')
+    # Contracts are parsed and written one at a time so large files are streamed
+    contract_parsed = parse_contracts(iter_sample_texts(source_file_name, './data/'))
 
+    writer = write_items_to_file_in_background(contract_parsed, target_file_name, path_name='./data/')
+    instrumentation.record('write_wait', writer.producer_wait_seconds, writer.n_items)
+    instrumentation.count('n_blocked_writes', writer.n_blocked_writes)
+    print('Waited %.3fs on a full write queue' % writer.producer_wait_seconds)
+
+    print('Done!')
+
+
+def load_transformer(cuda, cache_path, time_budget, instrumentation: Instrumentation):
+    # torch is only imported when the transformer is actually used
+    from src.transformer_pipeline import TransformerPipeline
+    from src.translation_cache import TranslationCache
+
+    print('Loading the transformer...')
+    # Identical descriptions are always decoded once, --cache also keeps the outputs across runs
+    cache = TranslationCache(db_path=cache_path)
+    return TransformerPipeline(cuda=cuda, cache=cache, instrumentation=instrumentation, time_budget=time_budget)
+
+
+def close_transformer(pipeline):
+    print(pipeline.cache.summary())
+    pipeline.cache.close()
+
+
+def translate_by_hybrid(source_file_name, target_file_name, cuda, cache_path, time_budget,
+                        instrumentation: Instrumentation):
+    from src.hybrid_translation import translate_hybrid
+
+    def translate_with_transformer(contract_texts):
+        # Only loaded when some contract needs it
+        pipeline = load_transformer(cuda, cache_path, time_budget, instrumentation)
+        contract_codes = pipeline.translate(contract_texts)
+        close_transformer(pipeline)
+        return contract_codes
+
+    print('Loading and translating texts...')
+    contract_codes, fallback_indices = translate_hybrid(load_sample_texts(source_file_name, './data/'),
+                                                        translate_with_transformer, instrumentation)
+    print('%d contracts translated by rule, %d by the transformer' %
+          (len(contract_codes) - len(fallback_indices), len(fallback_indices)))
+    write_items_to_file(contract_codes, target_file_name, path_name='./data/')
     print('Done!')
 
 
 def main():
-    if len(sys.argv) != 4:
+    cache_path = pop_option(sys.argv, '--cache', description='the path of the cache database')
+    time_budget = pop_option(sys.argv, '--time_budget', None, float, 'the number of seconds')
+    instrumentation, report_path, print_summary = pop_report_option(sys.argv)
+
+    if len(sys.argv) not in (4, 5):
         print('Please first give the name of the file containing the text to be translated and then'
               'the name of the file where the output should be.')
-        print('python translate.py source_file_name target_file_name [rule/transformer]')
+        print('python translate.py source_file_name target_file_name [rule/transformer/hybrid] [cuda]')
+        print('Add --cache cache.sqlite to reuse transformer outputs of identical descriptions across runs')
+        print('Add --time_budget seconds to finish the descriptions decoded together, a chunk of four batches, '
+              'after that long with what they have')
+        print('Add --report report.json (or .csv) and/or --summary to time every stage')
         exit(1)
     source_file_name = sys.argv[1]
     target_file_name = sys.argv[2]
     method = sys.argv[3]
-
+    cuda = len(sys.argv) == 5 and sys.argv[4] == 'cuda'
 
     if method == 'rule':
-        translate_by_rule(source_file_name, target_file_name)
+        translate_by_rule(source_file_name, target_file_name, instrumentation)
+    elif method == 'hybrid':
+        translate_by_hybrid(source_file_name, target_file_name, cuda, cache_path, time_budget, instrumentation)
     else:
-        cuda = False
-        if len(sys.argv) == 5:
-            cuda = sys.argv[4] == 'cuda'
-
-        print('Preparing the data for the transformer...')
-        os.system('python prepare_descriptions_for_transformer.py %s test.en number_table.txt variable_table.txt' % source_file_name)
-        print('Copying the data to the proper location for the transformer...')
-        os.system('cp ./data/test.en ./third_party_helper/attention-is-all-you-need-pytorch-master/data/multi30k/')
-        print('Tokenizing the data...')
-        os.system('bash tokenization.sh')
+        pipeline = load_transformer(cuda, cache_path, time_budget, instrumentation)
         print('Translating with the transformer...')
-        helper_path = './third_party_helper/attention-is-all-you-need-pytorch-master'
-        # print('python %s/translate.py -model %s/trained.chkpt -vocab %s/data/multi30k.atok.low.pt -src %s/data/multi30k/test.en.atok' % (helper_path, helper_path, helper_path, helper_path))
-        if cuda:
-            os.system('python %s/translate.py -model %s/trained.chkpt -vocab %s/data/multi30k.atok.low.pt -src %s/data/multi30k/test.en.atok' % (helper_path, helper_path, helper_path, helper_path))
-        else:
-            os.system(
-                'python %s/translate.py -model %s/trained.chkpt -vocab %s/data/multi30k.atok.low.pt -src %s/data/multi30k/test.en.atok -no_cuda' % (helper_path, helper_path, helper_path, helper_path))
-
-        os.system('mv ./pred.txt ./data/pred.txt')
-        print('Reformatting the output from transformer...')
-        os.system('python reformat_transformer_output.py pred.txt number_table.txt variable_table.txt %s' % target_file_name)
+        # Reading, preparing, decoding, restoring and writing all overlap, batch by batch
+        contract_codes = pipeline.translate_pipelined(iter_sample_texts(source_file_name, './data/'))
+        writer = write_items_to_file_in_background((contract_code + '\n' for contract_code in contract_codes),
+                                                   target_file_name, path_name='./data/')
+        instrumentation.record('write_wait', writer.producer_wait_seconds, writer.n_items)
+        instrumentation.count('n_blocked_writes', writer.n_blocked_writes)
+        close_transformer(pipeline)
         print('Done')
 
+    finish_report(instrumentation, report_path, print_summary)
+
 
 
 
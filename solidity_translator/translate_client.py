@@ -0,0 +1,36 @@
+import sys
+
+from src.translation_client import TranslationClient
+from src.utils.options import pop_option
+from src.utils.sample_loader_saver import load_sample_texts, write_items_to_file
+
+
+def main():
+    socket_path = pop_option(sys.argv, '--socket', description='the path of the server socket')
+    host = pop_option(sys.argv, '--host', '127.0.0.1', description='the host of the server')
+    port = pop_option(sys.argv, '--port', 8000, int, 'the port of the server')
+
+    if len(sys.argv) != 4:
+        print('Please first give the name of the file containing the text to be translated and then'
+              'the name of the file where the output should be.')
+        print('python translate_client.py source_file_name target_file_name [rule/transformer] '
+              '[--host HOST] [--port PORT] [--socket PATH]')
+        exit(1)
+    source_file_name = sys.argv[1]
+    target_file_name = sys.argv[2]
+    method = sys.argv[3]
+
+    with TranslationClient(host, port, socket_path) as client:
+        contract_codes = client.translate(load_sample_texts(source_file_name, './data/'), method)
+
+    # Written the same way translate.py writes each method's output
+    if method == 'rule':
+        write_items_to_file(contract_codes, target_file_name, path_name='./data/')
+    else:
+        write_items_to_file([contract_code + '\n' for contract_code in contract_codes], target_file_name,
+                            path_name='./data/')
+    print('Done')
+
+
+if __name__ == '__main__':
+    main()